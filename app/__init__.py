@@ -1,41 +1,125 @@
 from flask import Flask
 from config import Config
-from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_mail import Mail
+from contextlib import contextmanager
+from jinja2 import FileSystemBytecodeCache
+from app import database
 import os
+import time
 import logging
 from logging.handlers import SMTPHandler
 
-app = Flask(__name__)
-app.config.from_object(Config)
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-mail = Mail(app)
+db = SQLAlchemy(session_options={'class_': database.RoutingSession})
+mail = Mail()
 
-login = LoginManager(app)
-login.login_view = 'login'
+login = LoginManager()
+login.login_view = 'main.login'
 
-app.config['UPLOAD_FOLDER'] = os.path.join('static', 'uploads')
-app.config['MAX_CONTENT_LENGTH'] = 2 * 1024 * 1024  # 2 MB max size
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
-if not app.debug:
-    if app.config['MAIL_SERVER']:
-        auth = None
-        if app.config['MAIL_USERNAME'] or app.config['MAIL_PASSWORD']:
-            auth = (app.config['MAIL_USERNAME'], app.config['MAIL_PASSWORD'])
-        secure = None
-        if app.config['MAIL_USE_TLS']:
-            secure = ()
-        mail_handler = SMTPHandler(
-            mailhost=(app.config['MAIL_SERVER'], app.config['MAIL_PORT']),
-            fromaddr='no-reply@' + app.config['MAIL_SERVER'],
-            toaddrs=app.config['ADMINS'], subject='Microblog Failure',
-            credentials=auth, secure=secure)
-        mail_handler.setLevel(logging.ERROR)
-        app.logger.addHandler(mail_handler)
-
-
-from app import routes, models, errors
\ No newline at end of file
+
+@contextmanager
+def _timed(timings, phase):
+    started = time.perf_counter()
+    yield
+    timings[phase] = time.perf_counter() - started
+
+
+def create_app(config_class=Config):
+    started = time.perf_counter()
+    timings = {}
+
+    app = Flask(__name__)
+    app.config.from_object(config_class)
+
+    if app.config['PROXY_FIX_X_FOR']:
+        # Behind that many trusted proxies, take the client address (and
+        # scheme and host) from their X-Forwarded-* headers.
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'],
+                                x_proto=app.config['PROXY_FIX_X_FOR'],
+                                x_host=app.config['PROXY_FIX_X_FOR'])
+
+    if app.config['JINJA_CACHE_DIR']:
+        # Compiled templates survive restarts, so new workers skip the parse.
+        os.makedirs(app.config['JINJA_CACHE_DIR'], exist_ok=True)
+        app.jinja_options = dict(app.jinja_options, bytecode_cache=FileSystemBytecodeCache(
+            app.config['JINJA_CACHE_DIR']))
+
+    with _timed(timings, 'extensions'):
+        db.init_app(app)
+        database.init_app(app, db)
+        mail.init_app(app)
+        login.init_app(app)
+        # Alembic is slow to import and only the `flask db` commands need it.
+        if os.environ.get('FLASK_RUN_FROM_CLI'):
+            from flask_migrate import Migrate
+            Migrate(app, db)
+
+    with _timed(timings, 'services'):
+        from app import auth, search, fragments
+        from app.cache import cache
+        from app.email import outbox
+        from app.admission import admission
+        from app.reminders import reminders
+        from app.live import live
+        from app.metrics import metrics
+        from app.images import images
+        from app.assets import assets
+        from app.ratelimit import limiter
+        from app.stats import rollup
+        cache.init_app(app)
+        outbox.init_app(app)
+        admission.init_app(app)
+        reminders.init_app(app)
+        live.init_app(app)
+        metrics.init_app(app)
+        images.init_app(app)
+        assets.init_app(app)
+        fragments.init_app(app)
+        limiter.init_app(app)
+        rollup.init_app(app)
+
+    with _timed(timings, 'blueprints'):
+        from app.errors import bp as errors_bp
+        app.register_blueprint(errors_bp)
+
+        from app.routes import bp as main_bp
+        app.register_blueprint(main_bp)
+
+        from app.api import bp as api_bp
+        app.register_blueprint(api_bp, url_prefix='/api/v1')
+
+        from app.metrics import bp as metrics_bp
+        app.register_blueprint(metrics_bp)
+
+        from app.cli import bp as cli_bp
+        app.register_blueprint(cli_bp)
+
+    if not app.debug and not app.testing:
+        if app.config['MAIL_SERVER']:
+            credentials = None
+            if app.config['MAIL_USERNAME'] or app.config['MAIL_PASSWORD']:
+                credentials = (app.config['MAIL_USERNAME'], app.config['MAIL_PASSWORD'])
+            secure = None
+            if app.config['MAIL_USE_TLS']:
+                secure = ()
+            mail_handler = SMTPHandler(
+                mailhost=(app.config['MAIL_SERVER'], app.config['MAIL_PORT']),
+                fromaddr='no-reply@' + app.config['MAIL_SERVER'],
+                toaddrs=app.config['ADMINS'], subject='Microblog Failure',
+                credentials=credentials, secure=secure)
+            mail_handler.setLevel(logging.ERROR)
+            app.logger.addHandler(mail_handler)
+
+    timings['total'] = time.perf_counter() - started
+    app.extensions['startup'] = {'created_at': started, 'timings': timings}
+    app.logger.info('App created in %.1f ms (%s)', timings['total'] * 1000,
+                    ', '.join('{} {:.1f} ms'.format(phase, seconds * 1000)
+                              for phase, seconds in timings.items() if phase != 'total'))
+    return app
+
+
+from app import models
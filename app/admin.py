@@ -0,0 +1,91 @@
+import csv
+import io
+import json
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+import sqlalchemy as sa
+from flask import current_app
+from app import db
+from app.models import User, Event, Booking
+from app.pagination import parse_date
+
+BookingPage = namedtuple('BookingPage', ['items', 'next_cursor'])
+BookingFilters = namedtuple('BookingFilters', ['event_id', 'username', 'date_from', 'date_to'])
+
+EXPORT_FIELDS = ('booking_id', 'booked_at', 'seats', 'event_id', 'event_title',
+                 'user_id', 'username', 'email')
+
+
+def filters_from_args(args):
+    return BookingFilters(event_id=args.get('event_id', type=int),
+                          username=args.get('username', '').strip() or None,
+                          date_from=parse_date(args.get('date_from')),
+                          date_to=parse_date(args.get('date_to')))
+
+
+def booking_rows(filters):
+    # One joined select of plain columns: the dashboard and the exports
+    # never build Booking objects, so there are no per-row relationship loads.
+    query = (
+        sa.select(Booking.booking_id, Booking.booked_at, Booking.seats,
+                  Event.event_id, Event.title.label('event_title'),
+                  User.id.label('user_id'), User.username, User.email)
+        .join(User, Booking.user_id == User.id)
+        .join(Event, Booking.event_id == Event.event_id)
+    )
+    if filters.event_id is not None:
+        query = query.where(Booking.event_id == filters.event_id)
+    if filters.username:
+        query = query.where(User.username == filters.username)
+    if filters.date_from:
+        query = query.where(Booking.booked_at >= datetime.combine(filters.date_from, time.min))
+    if filters.date_to:
+        query = query.where(Booking.booked_at < datetime.combine(
+            filters.date_to + timedelta(days=1), time.min))
+    return query.order_by(Booking.booking_id.desc())
+
+
+def booking_page(filters, before=None, per_page=None):
+    per_page = per_page or current_app.config['ADMIN_BOOKINGS_PER_PAGE']
+    query = booking_rows(filters)
+    if before is not None:
+        query = query.where(Booking.booking_id < before)
+
+    rows = db.session.execute(query.limit(per_page + 1)).all()
+    if len(rows) > per_page:
+        return BookingPage(rows[:per_page], rows[per_page - 1].booking_id)
+    return BookingPage(rows, None)
+
+
+def _export_partitions(filters):
+    chunk_size = current_app.config['EXPORT_CHUNK_SIZE']
+    result = db.session.execute(
+        booking_rows(filters).execution_options(yield_per=chunk_size))
+    return result.partitions()
+
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def iter_csv(filters):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for rows in _export_partitions(filters):
+        writer.writerows(tuple(_export_value(v) for v in row) for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_json(filters):
+    separator = '['
+    for rows in _export_partitions(filters):
+        chunk = ','.join(json.dumps(dict(zip(EXPORT_FIELDS, map(_export_value, row))),
+                                    separators=(',', ':'))
+                         for row in rows)
+        yield separator + chunk
+        separator = ','
+    yield ']' if separator == ',' else '[]'
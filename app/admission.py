@@ -0,0 +1,141 @@
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+import sqlalchemy as sa
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.cache import cache
+from app.live import live
+from app.models import Event, Booking, AdmissionRequest
+from app.reservations import ReservationOutcome
+from app.stats import record_bookings
+from app.workers import BatchWorker
+
+
+class AdmissionQueue(BatchWorker):
+    # On-sale mode: instead of every booker contending on the event row, each
+    # request is appended to admission_request and a worker hands out the
+    # remaining seats in FIFO order, one transaction per batch.
+    name = 'admission'
+    workers_setting = 'ADMISSION_WORKERS'
+    poll_setting = 'ADMISSION_POLL_INTERVAL'
+
+    def enqueue(self, user_id, event_id, seats=1):
+        request = db.session.scalar(
+            sa.select(AdmissionRequest).where(AdmissionRequest.event_id == event_id,
+                                              AdmissionRequest.user_id == user_id,
+                                              AdmissionRequest.status == 'pending'))
+        if request is None:
+            request = AdmissionRequest(token=uuid.uuid4().hex, event_id=event_id,
+                                       user_id=user_id, seats=seats)
+            db.session.add(request)
+            db.session.commit()
+        self.notify()
+        return request
+
+    def _admit(self, event_id, requests, now):
+        seats_left = db.session.scalar(
+            sa.select(Event.seats_left).where(Event.event_id == event_id))
+        if seats_left is None:
+            for request in requests:
+                request.status = ReservationOutcome.NOT_FOUND.value
+                request.processed_at = now
+            return [], False
+
+        booked = set(db.session.scalars(
+            sa.select(Booking.user_id).where(
+                Booking.event_id == event_id,
+                Booking.user_id.in_({request.user_id for request in requests}))))
+        winners = []
+        seats = 0
+        for request in requests:
+            # A group that no longer fits is turned away; smaller requests
+            # behind it can still take the remaining seats.
+            if request.user_id in booked:
+                request.status = ReservationOutcome.ALREADY_BOOKED.value
+            elif seats + request.seats <= seats_left:
+                request.status = ReservationOutcome.BOOKED.value
+                booked.add(request.user_id)
+                winners.append(request)
+                seats += request.seats
+            else:
+                request.status = ReservationOutcome.SOLD_OUT.value
+            request.processed_at = now
+
+        if winners:
+            seats_left = db.session.execute(
+                sa.update(Event)
+                .where(Event.event_id == event_id, Event.seats_left >= seats)
+                .values(seats_left=Event.seats_left - seats, version=Event.version + 1)
+                .returning(Event.seats_left)
+                .execution_options(synchronize_session=False)).scalar()
+            if seats_left is None:
+                raise _SeatsChanged()
+            db.session.execute(sa.insert(Booking), [
+                {'user_id': request.user_id, 'event_id': event_id, 'seats': request.seats}
+                for request in winners])
+            record_bookings(event_id, seats)
+        return winners, bool(winners) and seats_left == 0
+
+    def process_batch(self):
+        # Seats or bookings changed underneath a pass through another path
+        # (an edit, a direct booking) roll it back whole; it is run again at
+        # once on fresh state instead of waiting out the poll interval with
+        # the queue still full.
+        for _ in range(current_app.config['ADMISSION_RETRIES']):
+            try:
+                return self._admit_batch()
+            except (_SeatsChanged, IntegrityError):
+                db.session.rollback()
+        return 0
+
+    def _admit_batch(self):
+        requests = db.session.scalars(
+            sa.select(AdmissionRequest)
+            .where(AdmissionRequest.status == 'pending')
+            .order_by(AdmissionRequest.id)
+            .limit(current_app.config['ADMISSION_BATCH_SIZE'])).all()
+        if not requests:
+            return 0
+
+        by_event = OrderedDict()
+        for request in requests:
+            by_event.setdefault(request.event_id, []).append(request)
+
+        now = datetime.now(timezone.utc)
+        admitted = {event_id: self._admit(event_id, event_requests, now)
+                    for event_id, event_requests in by_event.items()}
+        db.session.commit()
+
+        for event_id, (winners, sold_out) in admitted.items():
+            if winners:
+                cache.invalidate_event(event_id)
+                cache.invalidate_bookings(*(request.user_id for request in winners))
+                live.publish(event_id)
+        if any(sold_out for _, sold_out in admitted.values()):
+            cache.invalidate_listings()
+        return len(requests)
+
+    def status(self, token, user_id):
+        request = db.session.scalar(
+            sa.select(AdmissionRequest).where(AdmissionRequest.token == token,
+                                              AdmissionRequest.user_id == user_id))
+        if request is None:
+            return None
+        result = {'token': request.token, 'event_id': request.event_id,
+                  'seats': request.seats, 'status': request.status}
+        if request.status == 'pending':
+            result['position'] = db.session.scalar(
+                sa.select(sa.func.count(AdmissionRequest.id)).where(
+                    AdmissionRequest.event_id == request.event_id,
+                    AdmissionRequest.status == 'pending',
+                    AdmissionRequest.id <= request.id))
+        return result
+
+
+class _SeatsChanged(Exception):
+    pass
+
+
+admission = AdmissionQueue()
@@ -0,0 +1,185 @@
+import hashlib
+from flask import Blueprint, current_app, request, url_for
+from flask_login import current_user
+from app.admission import admission
+from app.cache import cache
+from app.database import read_only
+from app.idempotency import idempotent, replay, IdempotencyError
+from app.models import Event
+from app.pagination import listing_filters
+from app.reservations import reserve_seat, reserve_seats, release_seat, ReservationOutcome
+from app.search import find_events
+
+bp = Blueprint('api', __name__)
+
+API_LIST_COLUMNS = (Event.event_id, Event.title, Event.date, Event.time, Event.location,
+                    Event.seats_left, Event.version)
+
+_BOOKING_STATUS = {
+    ReservationOutcome.BOOKED: 201,
+    ReservationOutcome.CANCELLED: 200,
+    ReservationOutcome.ALREADY_BOOKED: 409,
+    ReservationOutcome.SOLD_OUT: 409,
+    ReservationOutcome.NOT_BOOKED: 404,
+    ReservationOutcome.NOT_FOUND: 404,
+}
+
+
+def _event_json(event):
+    # Short keys and ISO dates keep the payload small for kiosks and mobile.
+    data = {'id': event['event_id'], 'title': event['title'],
+            'date': event['date'].isoformat(), 'time': event['time'].strftime('%H:%M'),
+            'location': event['location'], 'seats_left': event['seats_left'],
+            'version': event['version']}
+    if 'description' in event:
+        data['description'] = event['description']
+        data['total_seats'] = event['total_seats']
+        data['on_sale'] = event['on_sale_queue']
+    return data
+
+
+def _error(message, status):
+    return {'error': message}, status
+
+
+@bp.errorhandler(IdempotencyError)
+def idempotency_error(error):
+    return _error(error.message, error.status)
+
+
+def _seats(value):
+    if isinstance(value, int) and not isinstance(value, bool) \
+            and 1 <= value <= current_app.config['MAX_SEATS_PER_BOOKING']:
+        return value
+    return None
+
+
+def _cacheable(etag, build):
+    # Answer a matching If-None-Match before the body is built at all.
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.make_response(build())
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['API_CACHE_MAX_AGE']
+    return response
+
+
+@bp.route('/events')
+@read_only
+def api_events():
+    config = current_app.config
+    limit = max(min(request.args.get('limit', config['EVENTS_PER_PAGE'], type=int),
+                    config['API_MAX_PAGE_SIZE']), 1)
+    cursor = request.args.get('after')
+    filters = listing_filters(request.args)
+
+    # The page is served from the listing cache, so the ETag is taken from
+    # the cache generation: a matching conditional GET touches no rows.
+    etag = 'l-' + hashlib.sha1('{}|{}|{}|{}'.format(
+        cache.listing_generation(), cursor, limit, tuple(filters)).encode()).hexdigest()
+
+    def build():
+        page = cache.event_page(cursor, filters, per_page=limit, columns=API_LIST_COLUMNS)
+        body = {'events': [_event_json(row) for row in page.items],
+                'next': page.next_cursor}
+        if page.next_cursor:
+            body['next_url'] = url_for('api.api_events', after=page.next_cursor, limit=limit,
+                                       **filters.args())
+        return body
+
+    return _cacheable(etag, build)
+
+
+@bp.route('/events/<int:event_id>')
+@read_only
+def api_event(event_id):
+    event = cache.event(event_id)
+    if event is None:
+        return _error('event not found', 404)
+    return _cacheable('e{}-v{}'.format(event_id, event['version']),
+                      lambda: _event_json(event))
+
+
+@bp.route('/search')
+@read_only
+def api_search():
+    query = request.args.get('q', '').strip()
+    config = current_app.config
+    limit = min(request.args.get('limit', config['SEARCH_RESULT_LIMIT'], type=int),
+                config['API_MAX_PAGE_SIZE'])
+    rows = find_events(query, limit=max(limit, 1)) if query else []
+    response = current_app.make_response({'query': query, 'events': [
+        {'id': row.event_id, 'title': row.title, 'date': row.date.isoformat(),
+         'time': row.time.strftime('%H:%M'), 'location': row.location}
+        for row in rows]})
+    response.cache_control.public = True
+    response.cache_control.max_age = config['API_CACHE_MAX_AGE']
+    return response
+
+
+@bp.route('/events/<int:event_id>/booking', methods=['POST', 'DELETE'])
+def api_booking(event_id):
+    if not current_user.is_authenticated:
+        return _error('authentication required', 401)
+
+    if request.method == 'DELETE':
+        outcome = replay('cancel', event_id) or idempotent(
+            'cancel', event_id, lambda record: release_seat(current_user.id, event_id, record))
+        return {'status': outcome.value}, _BOOKING_STATUS[outcome]
+
+    seats = _seats((request.get_json(silent=True) or {}).get('seats', 1))
+    if seats is None:
+        return _error('seats must be between 1 and {}'.format(
+            current_app.config['MAX_SEATS_PER_BOOKING']), 400)
+    outcome = replay('book', event_id)
+    if outcome is None:
+        event = cache.event(event_id)
+        if event is None:
+            return _error('event not found', 404)
+        if event['on_sale_queue']:
+            ticket = admission.enqueue(current_user.id, event_id, seats)
+            return {'status': 'queued', 'token': ticket.token,
+                    'status_url': url_for('main.admission_status', token=ticket.token)}, 202
+        outcome = idempotent('book', event_id, lambda record: reserve_seat(
+            current_user.id, event_id, seats, record))
+    return {'status': outcome.value, 'seats': seats}, _BOOKING_STATUS[outcome]
+
+
+@bp.route('/bookings', methods=['POST'])
+def api_bookings():
+    # {"events": [{"id": 1, "seats": 4}, ...]}: every event is booked in one
+    # transaction, or none is.
+    if not current_user.is_authenticated:
+        return _error('authentication required', 401)
+
+    items = (request.get_json(silent=True) or {}).get('events')
+    if not isinstance(items, list) or not items:
+        return _error('events must be a non-empty list', 400)
+    if len(items) > current_app.config['MAX_EVENTS_PER_BATCH']:
+        return _error('at most {} events per batch'.format(
+            current_app.config['MAX_EVENTS_PER_BATCH']), 400)
+
+    seats_by_event = {}
+    for item in items:
+        event_id = item.get('id') if isinstance(item, dict) else None
+        seats = _seats(item.get('seats', 1)) if isinstance(item, dict) else None
+        if not isinstance(event_id, int) or event_id in seats_by_event or seats is None:
+            return _error('each event needs a distinct integer id and 1 to {} seats'.format(
+                current_app.config['MAX_SEATS_PER_BOOKING']), 400)
+        seats_by_event[event_id] = seats
+
+    for event_id in seats_by_event:
+        event = cache.event(event_id)
+        if event is None:
+            return {'status': ReservationOutcome.NOT_FOUND.value, 'event_id': event_id}, 404
+        if event['on_sale_queue']:
+            return _error('event {} is on sale through the queue; book it on its own'
+                          .format(event_id), 409)
+
+    outcome, failed = reserve_seats(current_user.id, seats_by_event)
+    if outcome is not ReservationOutcome.BOOKED:
+        return {'status': outcome.value, 'event_id': failed}, _BOOKING_STATUS[outcome]
+    return {'status': outcome.value, 'events': [
+        {'id': event_id, 'seats': seats} for event_id, seats in seats_by_event.items()]}, 201
@@ -0,0 +1,63 @@
+from collections import namedtuple
+from datetime import datetime, timezone
+import sqlalchemy as sa
+from flask import current_app
+from app import db
+from app.cache import cache
+from app.models import (Event, Booking, AdmissionRequest, EventStats, EventArchive,
+                        BookingArchive)
+from app.stats import roll_up
+
+ArchiveReport = namedtuple('ArchiveReport', ['events', 'bookings'])
+
+_EVENT_COLUMNS = ('event_id', 'title', 'description', 'date', 'time', 'location',
+                  'total_seats', 'seats_left', 'created_by', 'image', 'thumbnail', 'version')
+_BOOKING_COLUMNS = ('booking_id', 'user_id', 'event_id', 'seats', 'booked_at')
+
+
+def archive_past_events(before, batch_size=None, on_progress=None):
+    # Moves events dated before `before`, with their bookings, into the
+    # archive tables one batch at a time, so the listing indexes only ever
+    # cover live rows and no single transaction holds the write lock long.
+    batch_size = batch_size or current_app.config['ARCHIVE_BATCH_SIZE']
+    events = bookings = 0
+    while True:
+        event_ids = db.session.scalars(
+            sa.select(Event.event_id).where(Event.date < before)
+            .order_by(Event.event_id).limit(batch_size)).all()
+        if not event_ids:
+            break
+        archived_at = sa.literal(datetime.now(timezone.utc), sa.DateTime)
+        attendees = db.session.scalars(
+            sa.select(Booking.user_id).where(Booking.event_id.in_(event_ids)).distinct()).all()
+
+        # The stats row is deleted with the event; its counters are kept on
+        # the archive row so all-time analytics still include them, and its
+        # pending counts are rolled into today's bucket first.
+        roll_up(event_ids)
+        db.session.execute(sa.insert(EventArchive).from_select(
+            _EVENT_COLUMNS + ('bookings', 'cancellations', 'archived_at'),
+            sa.select(*(getattr(Event, column) for column in _EVENT_COLUMNS),
+                      sa.func.coalesce(EventStats.bookings, 0),
+                      sa.func.coalesce(EventStats.cancellations, 0), archived_at)
+            .outerjoin(EventStats, EventStats.event_id == Event.event_id)
+            .where(Event.event_id.in_(event_ids))))
+        moved = db.session.execute(sa.insert(BookingArchive).from_select(
+            _BOOKING_COLUMNS + ('archived_at',),
+            sa.select(*(getattr(Booking, column) for column in _BOOKING_COLUMNS), archived_at)
+            .where(Booking.event_id.in_(event_ids)))).rowcount
+
+        for model in (Booking, AdmissionRequest, EventStats, Event):
+            db.session.execute(sa.delete(model).where(model.event_id.in_(event_ids))
+                               .execution_options(synchronize_session=False))
+        db.session.commit()
+
+        for event_id in event_ids:
+            cache.invalidate_event(event_id)
+        cache.invalidate_bookings(*attendees)
+        cache.invalidate_listings()
+        events += len(event_ids)
+        bookings += moved
+        if on_progress:
+            on_progress(ArchiveReport(events, bookings))
+    return ArchiveReport(events, bookings)
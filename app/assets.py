@@ -0,0 +1,114 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+from flask import current_app, request, send_from_directory, url_for
+
+SOURCE_DIRS = ('dist',)
+BUILD_DIR = 'build'
+MANIFEST = 'manifest.json'
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.html')
+# Preferred first when the client accepts both.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _compress(path):
+    written = []
+    with open(path, 'rb') as source:
+        data = source.read()
+    with gzip.GzipFile(path + '.gz', 'wb', compresslevel=9, mtime=0) as out:
+        out.write(data)
+    written.append(path + '.gz')
+    try:
+        import brotli
+    except ImportError:
+        return written
+    with open(path + '.br', 'wb') as out:
+        out.write(brotli.compress(data, quality=11))
+    written.append(path + '.br')
+    return written
+
+
+def build(static_folder):
+    # Copies every file under the source dirs to build/ with a content hash
+    # in its name, precompresses the text ones and writes the manifest that
+    # maps source names to fingerprinted ones. Returns the manifest.
+    target_root = os.path.join(static_folder, BUILD_DIR)
+    if os.path.isdir(target_root):
+        shutil.rmtree(target_root)
+    manifest = {}
+    for source_dir in SOURCE_DIRS:
+        for root, _, files in os.walk(os.path.join(static_folder, source_dir)):
+            for filename in sorted(files):
+                path = os.path.join(root, filename)
+                logical = os.path.relpath(path, static_folder).replace(os.sep, '/')
+                with open(path, 'rb') as source:
+                    digest = hashlib.sha256(source.read()).hexdigest()[:12]
+                stem, extension = os.path.splitext(logical[len(source_dir) + 1:])
+                fingerprinted = '{}/{}.{}{}'.format(BUILD_DIR, stem, digest, extension)
+                target = os.path.join(static_folder, fingerprinted)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copyfile(path, target)
+                if extension in COMPRESSIBLE:
+                    _compress(target)
+                manifest[logical] = fingerprinted
+    with open(os.path.join(static_folder, MANIFEST), 'w') as out:
+        json.dump(manifest, out, indent=2, sort_keys=True)
+    return manifest
+
+
+class Assets:
+    # Without a manifest (no build yet, or in development) asset_url falls
+    # back to the plain file and nothing is cached for long. Each app keeps
+    # the manifest of its own static folder in app.extensions['assets'].
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.load(app)
+        app.add_template_global(asset_url)
+        app.view_functions['static'] = send_static
+
+    def load(self, app):
+        try:
+            with open(os.path.join(app.static_folder, MANIFEST)) as source:
+                manifest = json.load(source)
+        except FileNotFoundError:
+            manifest = {}
+        app.extensions['assets'] = {'manifest': manifest,
+                                    'fingerprinted': frozenset(manifest.values())}
+
+
+def asset_url(filename, **values):
+    manifest = current_app.extensions['assets']['manifest']
+    return url_for('static', filename=manifest.get(filename, filename), **values)
+
+
+def send_static(filename):
+    if filename not in current_app.extensions['assets']['fingerprinted']:
+        return current_app.send_static_file(filename)
+
+    # Fingerprinted names never change content: serve the best precompressed
+    # variant and let clients and proxies keep it for a year.
+    folder = current_app.static_folder
+    mimetype = mimetypes.guess_type(filename)[0]
+    for encoding, suffix in ENCODINGS:
+        if (encoding in request.accept_encodings
+                and os.path.isfile(os.path.join(folder, filename + suffix))):
+            response = send_from_directory(folder, filename + suffix, mimetype=mimetype,
+                                           max_age=current_app.config['ASSET_MAX_AGE'])
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_from_directory(folder, filename,
+                                       max_age=current_app.config['ASSET_MAX_AGE'])
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+assets = Assets()
@@ -0,0 +1,49 @@
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from flask_login import UserMixin
+from app import login
+from app.cache import cache
+from app.models import User
+
+_PRINCIPAL_FIELDS = ('role', 'password_hash')
+
+
+class UserPrincipal(UserMixin):
+    # What a request needs to know about the signed-in user. Loaded from the
+    # cache instead of the database on every authenticated request.
+    def __init__(self, id, username, role):
+        self.id = id
+        self.username = username
+        self.role = role
+
+    def __repr__(self):
+        return '<UserPrincipal {}>'.format(self.username)
+
+
+@login.user_loader
+def load_user(id):
+    principal = cache.user(int(id))
+    return UserPrincipal(**principal) if principal is not None else None
+
+
+@sa.event.listens_for(so.Session, 'after_flush')
+def _collect_changed_users(session, flush_context):
+    changed = session.info.setdefault('changed_user_ids', set())
+    for user in session.dirty:
+        if isinstance(user, User) and any(
+                sa.inspect(user).attrs[field].history.has_changes()
+                for field in _PRINCIPAL_FIELDS):
+            changed.add(user.id)
+    changed.update(user.id for user in session.deleted if isinstance(user, User))
+
+
+@sa.event.listens_for(so.Session, 'after_commit')
+def _invalidate_changed_users(session):
+    changed = session.info.pop('changed_user_ids', None)
+    if changed:
+        cache.invalidate_users(*changed)
+
+
+@sa.event.listens_for(so.Session, 'after_rollback')
+def _forget_changed_users(session):
+    session.info.pop('changed_user_ids', None)
@@ -0,0 +1,148 @@
+import csv
+import json
+from collections import namedtuple
+from datetime import date, time
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql, sqlite
+from werkzeug.datastructures import MultiDict
+from flask import current_app
+from app import db
+from app.forms import CreationForm
+from app.models import Event
+
+ImportReport = namedtuple('ImportReport', ['read', 'written', 'skipped', 'rejected'])
+
+EXPORT_FIELDS = ('event_id', 'title', 'description', 'date', 'time', 'location',
+                 'total_seats', 'seats_left', 'on_sale_queue', 'created_by')
+_TRUE = ('1', 'true', 'yes', 'y', 'on')
+
+
+def read_rows(stream, fmt):
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _formdata(row):
+    data = MultiDict()
+    for key, value in row.items():
+        if key == 'on_sale_queue':
+            value = 'y' if str(value).strip().lower() in _TRUE else ''
+        elif value is None:
+            value = ''
+        data[key] = str(value)
+    return data
+
+
+def validate_row(row):
+    # Same rules as the create_event form, applied to a file row.
+    form = CreationForm(formdata=_formdata(row), meta={'csrf': False})
+    if not form.validate():
+        return None, form.errors
+    return {'title': form.title.data,
+            'description': form.description.data,
+            'date': form.date.data,
+            'time': form.time.data,
+            'location': form.location.data,
+            'total_seats': form.total_seats.data,
+            'seats_left': form.total_seats.data,
+            'on_sale_queue': form.on_sale_queue.data}, None
+
+
+def _insert_statement(upsert):
+    dialect = db.engine.dialect.name
+    if dialect not in ('sqlite', 'postgresql'):
+        if upsert:
+            raise RuntimeError('Upserts are not supported on {}'.format(dialect))
+        return sa.insert(Event)
+
+    insert = (sqlite if dialect == 'sqlite' else postgresql).insert(Event)
+    if not upsert:
+        return insert.on_conflict_do_nothing(index_elements=['title'])
+
+    # Keep the seats that are already booked when total_seats changes.
+    booked = Event.total_seats - Event.seats_left
+    return insert.on_conflict_do_update(index_elements=['title'], set_={
+        'description': insert.excluded.description,
+        'date': insert.excluded.date,
+        'time': insert.excluded.time,
+        'location': insert.excluded.location,
+        'total_seats': insert.excluded.total_seats,
+        'seats_left': sa.case((insert.excluded.total_seats > booked,
+                               insert.excluded.total_seats - booked), else_=0),
+        'on_sale_queue': insert.excluded.on_sale_queue,
+        'created_by': insert.excluded.created_by,
+        'version': Event.version + 1,
+    })
+
+
+def import_events(rows, created_by, upsert=False, batch_size=None,
+                  on_reject=None, on_progress=None):
+    batch_size = batch_size or current_app.config['IMPORT_BATCH_SIZE']
+    statement = _insert_statement(upsert)
+    read = written = skipped = rejected = 0
+    batch = []
+
+    def flush():
+        nonlocal written, skipped
+        # A Core executemany on the session's connection, rather than an ORM
+        # bulk insert, so rowcount reports how many rows were really written.
+        result = db.session.connection().execute(statement, batch)
+        db.session.commit()
+        count = result.rowcount if result.rowcount >= 0 else len(batch)
+        written += count
+        skipped += len(batch) - count
+        batch.clear()
+        if on_progress:
+            on_progress(ImportReport(read, written, skipped, rejected))
+
+    for line_no, row in enumerate(rows, start=1):
+        read += 1
+        values, errors = validate_row(row)
+        if errors:
+            rejected += 1
+            if on_reject:
+                on_reject(line_no, row, errors)
+            continue
+        values['created_by'] = created_by
+        batch.append(values)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return ImportReport(read, written, skipped, rejected)
+
+
+def _export_value(value):
+    # Dates and times go out in the formats CreationForm reads back in.
+    if isinstance(value, time):
+        return value.strftime('%H:%M')
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def export_events(stream, fmt, chunk_size=None):
+    chunk_size = chunk_size or current_app.config['EXPORT_CHUNK_SIZE']
+    columns = [getattr(Event, field) for field in EXPORT_FIELDS]
+    result = db.session.execute(
+        sa.select(*columns).order_by(Event.event_id).execution_options(yield_per=chunk_size))
+
+    writer = None
+    if fmt == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(EXPORT_FIELDS)
+    count = 0
+    for rows in result.partitions():
+        for row in rows:
+            values = [_export_value(value) for value in row]
+            if writer:
+                writer.writerow(values)
+            else:
+                stream.write(json.dumps(dict(zip(EXPORT_FIELDS, values)),
+                                        separators=(',', ':')) + '\n')
+        count += len(rows)
+    return count
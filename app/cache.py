@@ -0,0 +1,212 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+import sqlalchemy as sa
+from flask import current_app
+from werkzeug.utils import import_string
+from app import db
+from app.models import User, Event, Booking
+from app.pagination import EVENT_CARD_COLUMNS, event_page
+
+EVENT_DETAIL_COLUMNS = (Event.event_id, Event.title, Event.description, Event.date,
+                        Event.time, Event.location, Event.total_seats, Event.seats_left,
+                        Event.created_by, Event.on_sale_queue, Event.version,
+                        Event.image, Event.thumbnail)
+USER_PRINCIPAL_COLUMNS = (User.id, User.username, User.role)
+
+
+# Interface for cache backends. A shared backend (memcached, redis, ...) only
+# has to implement these three methods and be named in CACHE_BACKEND; values
+# are plain dicts, lists and tuples of primitives so they pickle cleanly.
+class CacheBackend:
+    def __init__(self, config):
+        self.config = config
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def delete(self, *keys):
+        raise NotImplementedError
+
+
+class NullCache(CacheBackend):
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+
+class MemoryCache(CacheBackend):
+    # Per-process LRU with a TTL on every entry. Invalidation is local to the
+    # process, so the TTL bounds how stale other workers can be.
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.max_entries = config['CACHE_MAX_ENTRIES']
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class _CacheState:
+    def __init__(self, backend):
+        self.backend = backend
+        self.lock = threading.Lock()
+        self.counts = Counter()
+
+
+class EventCache:
+    # The backend and counters belong to the app (app.extensions['event_cache']),
+    # so apps sharing a process never read or invalidate each other's entries.
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['event_cache'] = _CacheState(
+            import_string(app.config['CACHE_BACKEND'])(app.config))
+
+    @property
+    def _state(self):
+        return current_app.extensions['event_cache']
+
+    @property
+    def backend(self):
+        return self._state.backend
+
+    def _count(self, name):
+        state = self._state
+        with state.lock:
+            state.counts[name] += 1
+
+    def _read_through(self, key, load, ttl=None):
+        backend = self.backend
+        value = backend.get(key)
+        self._count('hits' if value is not None else 'misses')
+        if value is None:
+            value = load()
+            if value is not None:
+                backend.set(key, value, ttl or current_app.config['CACHE_TTL'])
+        return value
+
+    def listing_generation(self):
+        # Listing pages are keyed by cursor, so they're invalidated as a group
+        # by moving to a new generation; the old pages just age out. It also
+        # expires with the TTL, so it moves at least that often.
+        generation = self.backend.get('events:generation')
+        if generation is None:
+            generation = time.time_ns()
+            self.backend.set('events:generation', generation, current_app.config['CACHE_TTL'])
+        return generation
+
+    def event_page(self, cursor=None, filters=None, per_page=None, columns=EVENT_CARD_COLUMNS):
+        per_page = per_page or current_app.config['EVENTS_PER_PAGE']
+        key = 'events:{}:{}:{}:{}:{}'.format(self.listing_generation(), cursor or '', per_page,
+                                             tuple(filters) if filters else '',
+                                             ','.join(column.key for column in columns))
+
+        def load():
+            page = event_page(cursor, per_page=per_page, columns=columns, filters=filters)
+            return page._replace(items=[row._asdict() for row in page.items])
+
+        return self._read_through(key, load)
+
+    def event(self, event_id):
+        def load():
+            row = db.session.execute(
+                sa.select(*EVENT_DETAIL_COLUMNS).where(Event.event_id == event_id)).first()
+            return row._asdict() if row is not None else None
+
+        return self._read_through('event:{}'.format(event_id), load)
+
+    def booked_event_ids(self, user_id):
+        def load():
+            return db.session.scalars(
+                sa.select(Booking.event_id).where(Booking.user_id == user_id)).all()
+
+        return self._read_through('user:{}:booked'.format(user_id), load)
+
+    def user(self, user_id):
+        def load():
+            row = db.session.execute(
+                sa.select(*USER_PRINCIPAL_COLUMNS).where(User.id == user_id)).first()
+            return row._asdict() if row is not None else None
+
+        return self._read_through('user:{}'.format(user_id), load,
+                                  current_app.config['USER_CACHE_TTL'])
+
+    def fragment(self, key, render):
+        # Rendered HTML keyed by everything it depends on, so entries are
+        # never invalidated, only aged out. Counted apart from the data cache.
+        backend = self.backend
+        html = backend.get('fragment:' + key)
+        self._count('fragment_hits' if html is not None else 'fragment_misses')
+        if html is None:
+            html = render()
+            backend.set('fragment:' + key, html, current_app.config['FRAGMENT_CACHE_TTL'])
+        return html
+
+    def invalidate_users(self, *user_ids):
+        self.backend.delete(*('user:{}'.format(user_id) for user_id in user_ids))
+        self._count('invalidations')
+
+    def invalidate_bookings(self, *user_ids):
+        self.backend.delete(*('user:{}:booked'.format(user_id) for user_id in user_ids))
+        self._count('invalidations')
+
+    def invalidate_event(self, event_id):
+        self.backend.delete('event:{}'.format(event_id))
+        self._count('invalidations')
+
+    def invalidate_listings(self):
+        self.backend.set('events:generation', time.time_ns(), current_app.config['CACHE_TTL'])
+        self._count('invalidations')
+
+    def stats(self):
+        state = self._state
+        with state.lock:
+            stats = {name: state.counts[name] for name in
+                     ('hits', 'misses', 'invalidations', 'fragment_hits', 'fragment_misses')}
+        stats['backend'] = type(state.backend).__name__
+        if isinstance(state.backend, MemoryCache):
+            stats['entries'] = len(state.backend)
+            stats['evictions'] = state.backend.evictions
+        return stats
+
+
+cache = EventCache()
@@ -0,0 +1,228 @@
+import json
+import os
+import sys
+from datetime import date, timedelta
+import click
+from flask import Blueprint, current_app
+from app import db
+from app.admission import admission
+from app.assets import assets, build as build_assets
+from app.archive import archive_past_events
+from app.database import sync_replica
+from app.bulk import read_rows, import_events, export_events
+from app.email import outbox
+from app.idempotency import purge_expired
+from app.images import images, make_thumbnail
+from app.reminders import reminders
+from app.stats import rebuild, roll_up
+
+bp = Blueprint('cli', __name__, cli_group=None)
+
+
+@bp.cli.group()
+def mail():
+    """Outbound email queue commands."""
+
+
+@mail.command()
+def drain():
+    """Send every message that is currently due, then exit."""
+    click.echo('Sent {} message(s).'.format(outbox.drain()))
+
+
+@mail.command()
+@click.option('--workers', type=int, default=None,
+              help='Worker threads to run (defaults to MAIL_WORKERS).')
+def work(workers):
+    """Run the outbox worker pool in the foreground."""
+    threads = outbox.start(workers or current_app.config['MAIL_WORKERS'] or 1)
+    click.echo('Running {} outbox worker(s), press Ctrl+C to stop.'.format(len(threads)))
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        pass
+
+
+@bp.cli.group('admission')
+def admission_cli():
+    """On-sale admission queue commands."""
+
+
+@admission_cli.command('drain')
+def admission_drain():
+    """Process every pending admission request, then exit."""
+    click.echo('Processed {} request(s).'.format(admission.drain()))
+
+
+@bp.cli.group('reminders')
+def reminders_cli():
+    """Event reminder commands."""
+
+
+@reminders_cli.command('send')
+def reminders_send():
+    """Queue reminders for every event starting within the window, then exit."""
+    click.echo('Queued {} reminder(s).'.format(reminders.drain()))
+
+
+@reminders_cli.command('work')
+def reminders_work():
+    """Check for upcoming events every REMINDER_POLL_INTERVAL seconds."""
+    threads = reminders.start(current_app.config['REMINDER_WORKERS'] or 1)
+    click.echo('Running the reminder scheduler, press Ctrl+C to stop.')
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        pass
+
+
+def _format_for(stream, fmt):
+    if fmt:
+        return fmt
+    return 'jsonl' if stream.name.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+@bp.cli.group('events')
+def events_cli():
+    """Bulk event import, export and archiving."""
+
+
+@events_cli.command('import')
+@click.argument('stream', metavar='PATH', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None,
+              help='File format (guessed from the extension by default).')
+@click.option('--upsert', is_flag=True, help='Update events whose title already exists.')
+@click.option('--batch-size', type=int, default=None,
+              help='Rows per INSERT batch (defaults to IMPORT_BATCH_SIZE).')
+@click.option('--created-by', default='import', show_default=True)
+def import_command(stream, fmt, upsert, batch_size, created_by):
+    """Import events from a CSV or JSON Lines file."""
+    def reject(line_no, row, errors):
+        click.echo('Row {} rejected: {}'.format(line_no, json.dumps(errors)), err=True)
+
+    def progress(report):
+        click.echo('{0.read} read, {0.written} written, {0.skipped} skipped, '
+                   '{0.rejected} rejected'.format(report))
+
+    report = import_events(read_rows(stream, _format_for(stream, fmt)), created_by,
+                           upsert=upsert, batch_size=batch_size,
+                           on_reject=reject, on_progress=progress)
+    click.echo('Done: {0.written} written, {0.skipped} skipped as duplicates, '
+               '{0.rejected} rejected.'.format(report))
+    if report.rejected:
+        sys.exit(1)
+
+
+@events_cli.command('export')
+@click.argument('stream', metavar='PATH', type=click.File('w', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None,
+              help='File format (guessed from the extension by default).')
+def export_command(stream, fmt):
+    """Stream every event to a CSV or JSON Lines file."""
+    count = export_events(stream, _format_for(stream, fmt))
+    click.echo('Exported {} event(s).'.format(count), err=True)
+
+
+@events_cli.command('archive')
+@click.option('--before', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Archive events dated before this day (defaults to ARCHIVE_AFTER_DAYS ago).')
+@click.option('--batch-size', type=int, default=None,
+              help='Events per transaction (defaults to ARCHIVE_BATCH_SIZE).')
+def archive_command(before, batch_size):
+    """Move past events and their bookings into the archive tables."""
+    if before is None:
+        before = date.today() - timedelta(days=current_app.config['ARCHIVE_AFTER_DAYS'])
+    else:
+        before = before.date()
+
+    def progress(report):
+        click.echo('{0.events} event(s), {0.bookings} booking(s) archived'.format(report))
+
+    report = archive_past_events(before, batch_size=batch_size, on_progress=progress)
+    click.echo('Done: archived {0.events} event(s) dated before {1}.'.format(report, before))
+
+
+
+@bp.cli.group('idempotency')
+def idempotency_cli():
+    """Idempotency key commands."""
+
+
+@idempotency_cli.command('purge')
+def idempotency_purge():
+    """Delete idempotency keys older than IDEMPOTENCY_TTL."""
+    click.echo('Purged {} key(s).'.format(purge_expired()))
+
+
+@bp.cli.group('stats')
+def stats_cli():
+    """Booking statistics commands."""
+
+
+@stats_cli.command('rebuild')
+def stats_rebuild():
+    """Reconcile the booking statistics tables with the booking table."""
+    events, days = rebuild()
+    click.echo('Rebuilt stats for {} event(s); {} day bucket(s) raised.'.format(events, days))
+
+
+@stats_cli.command('rollup')
+def stats_rollup():
+    """Roll pending per-event counts into the daily booking totals now."""
+    events = roll_up()
+    db.session.commit()
+    click.echo('Rolled up {} event(s).'.format(events))
+
+
+@bp.cli.group('images')
+def images_cli():
+    """Event image commands."""
+
+
+@images_cli.command('thumbnails')
+def images_thumbnails():
+    """Build the thumbnails that are missing, in this process."""
+    built = 0
+    for name in images.missing_thumbnails():
+        thumbnail = images.ready_thumbnail(name)
+        if thumbnail is None:
+            thumbnail = images.thumbnail_name(name)
+            try:
+                make_thumbnail(os.path.join(images.folder, name),
+                               os.path.join(images.folder, thumbnail),
+                               current_app.config['THUMBNAIL_SIZE'])
+            except Exception as error:
+                click.echo('{}: {}'.format(name, error), err=True)
+                continue
+        built += images.attach(name, thumbnail)
+    click.echo('Attached thumbnails to {} event(s).'.format(built))
+
+
+@bp.cli.group('assets')
+def assets_cli():
+    """Static asset commands."""
+
+
+@assets_cli.command('build')
+def assets_build():
+    """Fingerprint and precompress static/dist and write the manifest."""
+    manifest = build_assets(current_app.static_folder)
+    assets.load(current_app)
+    for source, target in sorted(manifest.items()):
+        click.echo('{} -> {}'.format(source, target))
+
+
+@bp.cli.group('replica')
+def replica_cli():
+    """Read replica commands."""
+
+
+@replica_cli.command('sync')
+def replica_sync():
+    """Copy the primary SQLite database over the file-copy replica."""
+    if 'replica' not in current_app.config['SQLALCHEMY_BINDS']:
+        click.echo('No replica configured (set REPLICA_DATABASE_URL).', err=True)
+        sys.exit(1)
+    click.echo('Replica synced in {:.1f} ms.'.format(sync_replica(db) * 1000))
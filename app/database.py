@@ -0,0 +1,84 @@
+import time
+from functools import wraps
+import sqlalchemy as sa
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+
+
+class RoutingSession(Session):
+    # Statements run inside a @read_only view go to the 'replica' bind when
+    # one is configured. Flushes and INSERT/UPDATE/DELETE always go to the
+    # primary, and mark the request as having written.
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            writing = self._flushing or isinstance(clause, sa.UpdateBase)
+            if writing and has_request_context():
+                g.db_wrote = True
+            elif not writing and _reading_from_replica():
+                return self._db.engines['replica']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _reading_from_replica():
+    return has_request_context() and g.get('use_replica', False)
+
+
+def replica_configured():
+    return 'replica' in (current_app.config.get('SQLALCHEMY_BINDS') or {})
+
+
+def read_only(view):
+    @wraps(view)
+    def decorated_function(*args, **kwargs):
+        # Clients that wrote recently keep reading from the primary for a
+        # while, so they see their own bookings despite replica lag.
+        if (request.method == 'GET' and replica_configured()
+                and session.get('read_primary_until', 0) < time.time()):
+            g.use_replica = True
+        return view(*args, **kwargs)
+    return decorated_function
+
+
+def _remember_write(response):
+    if g.get('db_wrote'):
+        session['read_primary_until'] = (time.time()
+                                         + current_app.config['REPLICA_READ_AFTER_WRITE'])
+    return response
+
+
+def _configure_sqlite(journal_mode, busy_timeout):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA busy_timeout = {:d}'.format(busy_timeout))
+        if journal_mode:
+            cursor.execute('PRAGMA journal_mode = {}'.format(journal_mode))
+            if journal_mode.lower() == 'wal':
+                cursor.execute('PRAGMA synchronous = NORMAL')
+        cursor.close()
+    return on_connect
+
+
+def init_app(app, db):
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite' and engine.url.database not in (None, '', ':memory:'):
+                sa.event.listen(engine, 'connect', _configure_sqlite(
+                    app.config['SQLITE_JOURNAL_MODE'], app.config['SQLITE_BUSY_TIMEOUT']))
+    if 'replica' in (app.config.get('SQLALCHEMY_BINDS') or {}):
+        app.after_request(_remember_write)
+
+
+def sync_replica(db):
+    # Stand-in replication for a local file-copy replica: a consistent
+    # online copy of the primary through SQLite's backup API.
+    primary, replica = db.engines[None], db.engines['replica']
+    if primary.dialect.name != 'sqlite' or replica.dialect.name != 'sqlite':
+        raise RuntimeError('sync_replica only copies SQLite databases')
+    started = time.perf_counter()
+    source, target = primary.raw_connection(), replica.raw_connection()
+    try:
+        source.driver_connection.backup(target.driver_connection)
+    finally:
+        target.close()
+        source.close()
+    return time.perf_counter() - started
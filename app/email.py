@@ -1,24 +1,118 @@
 from flask_mail import Message
-from app import mail, app
-from flask import render_template
-from threading import Thread
+from app import mail, db
+from app.models import OutboundEmail
+from app.workers import BatchWorker
+from flask import render_template, current_app
+from datetime import datetime, timedelta, timezone
+import smtplib
+import uuid
+import sqlalchemy as sa
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class Outbox(BatchWorker):
+    # Mail is written to the outbound_email table first, so nothing queued is
+    # lost if the process dies. Workers claim due messages in batches and send
+    # each batch over one SMTP connection.
+    name = 'outbox'
+    workers_setting = 'MAIL_WORKERS'
+    poll_setting = 'MAIL_POLL_INTERVAL'
+
+    def claim_batch(self):
+        now = _now()
+        stale = now - timedelta(seconds=current_app.config['MAIL_LEASE_TIMEOUT'])
+        claimable = sa.or_(
+            sa.and_(OutboundEmail.status == 'pending', OutboundEmail.next_attempt_at <= now),
+            sa.and_(OutboundEmail.status == 'sending', OutboundEmail.claimed_at < stale))
+        candidates = (sa.select(OutboundEmail.id).where(claimable)
+                      .order_by(OutboundEmail.next_attempt_at)
+                      .limit(current_app.config['MAIL_BATCH_SIZE']))
+
+        # Other workers may pick the same candidates; the token records which
+        # of them this worker actually won.
+        token = uuid.uuid4().hex
+        db.session.execute(
+            sa.update(OutboundEmail)
+            .where(OutboundEmail.id.in_(candidates.scalar_subquery()), claimable)
+            .values(status='sending', claim_token=token, claimed_at=now)
+            .execution_options(synchronize_session=False))
+        db.session.commit()
+        return db.session.scalars(
+            sa.select(OutboundEmail).where(OutboundEmail.claim_token == token,
+                                           OutboundEmail.status == 'sending')).all()
+
+    def _reschedule(self, email, error):
+        email.attempts += 1
+        email.last_error = str(error)[:256]
+        if email.attempts >= current_app.config['MAIL_MAX_ATTEMPTS']:
+            email.status = 'failed'
+        else:
+            delay = min(current_app.config['MAIL_RETRY_BACKOFF'] * 2 ** (email.attempts - 1),
+                        current_app.config['MAIL_RETRY_BACKOFF_MAX'])
+            email.status = 'pending'
+            email.next_attempt_at = _now() + timedelta(seconds=delay)
+
+    def process_batch(self):
+        batch = self.claim_batch()
+        if not batch:
+            return 0
+
+        sent = 0
+        pending = list(batch)
+        try:
+            with mail.connect() as connection:
+                while pending:
+                    email = pending[0]
+                    message = Message(email.subject, sender=email.sender,
+                                      recipients=email.recipients)
+                    message.body = email.text_body
+                    message.html = email.html_body
+                    try:
+                        connection.send(message)
+                    except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused) as e:
+                        # The server refused this one message; the connection
+                        # is still good for the rest of the batch.
+                        self._reschedule(pending.pop(0), e)
+                        continue
+                    except (smtplib.SMTPServerDisconnected, OSError):
+                        raise
+                    except Exception as e:
+                        self._reschedule(pending.pop(0), e)
+                        continue
+                    pending.pop(0)
+                    email.status = 'sent'
+                    email.sent_at = _now()
+                    sent += 1
+        except Exception as e:
+            # The connection itself failed: everything not yet sent goes back
+            # on the queue with backoff.
+            current_app.logger.warning('Outbox batch failed: %s', e)
+            for email in pending:
+                self._reschedule(email, e)
+
+        db.session.commit()
+        return sent
+
+
+outbox = Outbox()
 
-def send_async_email(app, msg):
-    with app.app_context():
-        mail.send(msg)
 
 def send_email(subject, sender, recipients, text_body, html_body):
-    msg = Message(subject, sender=sender, recipients=recipients)
-    msg.body = text_body
-    msg.html = html_body
-    Thread(target=send_async_email, args=(app, msg)).start()
+    db.session.add(OutboundEmail(subject=subject, sender=sender,
+                                 recipients=list(recipients),
+                                 text_body=text_body, html_body=html_body))
+    db.session.commit()
+    outbox.notify()
 
 def send_password_reset_email(user):
     token = user.get_reset_password_token()
     send_email('[Microblog] Reset Your Password',
-               sender=app.config['ADMINS'][0],
+               sender=current_app.config['ADMINS'][0],
                recipients=[user.email],
                text_body=render_template('email/reset_password.txt',
                                          user=user, token=token),
                html_body=render_template('email/reset_password.html',
-                                         user=user, token=token))
\ No newline at end of file
+                                         user=user, token=token))
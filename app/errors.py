@@ -1,11 +1,20 @@
-from flask import render_template
-from app import app, db
+from flask import Blueprint, render_template
+from app import db
 
-@app.errorhandler(404)
+bp = Blueprint('errors', __name__)
+
+@bp.app_errorhandler(404)
 def not_found_error(error):
     return render_template('404.html'), 404
 
-@app.errorhandler(500)
+@bp.app_errorhandler(429)
+def too_many_requests_error(error):
+    headers = {}
+    if error.retry_after is not None:
+        headers['Retry-After'] = str(error.retry_after)
+    return render_template('429.html'), 429, headers
+
+@bp.app_errorhandler(500)
 def internal_error(error):
     db.session.rollback()
     return render_template('500.html'), 500
\ No newline at end of file
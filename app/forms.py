@@ -1,8 +1,9 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileAllowed
 from wtforms import StringField, PasswordField, SubmitField, BooleanField, DateField, IntegerField, TimeField
 from wtforms.validators import ValidationError, DataRequired, Email, EqualTo, NumberRange
 import sqlalchemy as sa
-from app import db
+from app import db, ALLOWED_EXTENSIONS
 from app.models import User
 
 
@@ -38,6 +39,8 @@ class CreationForm(FlaskForm):
     time = TimeField('Time', format='%H:%M', validators=[DataRequired()])
     location = StringField('Location', validators=[DataRequired()])
     total_seats = IntegerField('Total Seats', validators=[DataRequired(), NumberRange(min=1)])
+    on_sale_queue = BooleanField('Admission queue (on-sale mode)')
+    image = FileField('Image', validators=[FileAllowed(ALLOWED_EXTENSIONS, 'Images only!')])
     submit = SubmitField('Add')
 
 
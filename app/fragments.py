@@ -0,0 +1,21 @@
+from flask import current_app
+from flask_login import current_user
+from markupsafe import Markup
+from app.cache import cache
+
+
+def event_card(template, event, booked=False):
+    # Every write to an event bumps its version, so (id, version) pins the
+    # card's data; the viewer's role and booking are the only other inputs.
+    role = current_user.role if current_user.is_authenticated else 'anonymous'
+    key = '{}:{}:{}:{}:{:d}'.format(template, event['event_id'], event['version'], role, booked)
+
+    def render():
+        return current_app.jinja_env.get_template(template).render(
+            event=event, booked=booked, is_admin=role == 'admin')
+
+    return Markup(cache.fragment(key, render))
+
+
+def init_app(app):
+    app.add_template_global(event_card)
@@ -0,0 +1,104 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import sqlalchemy as sa
+from flask import current_app, request
+from flask_login import current_user
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import IdempotencyKey
+from app.reservations import ReservationOutcome
+
+MAX_KEY_LENGTH = 64
+
+_sweep_lock = threading.Lock()
+_next_sweep = 0.0
+
+
+class IdempotencyError(Exception):
+    def __init__(self, message, status, event_id):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.event_id = event_id
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def request_key():
+    # API clients send the Idempotency-Key header; HTML forms carry the key
+    # in a hidden field, so a browser resubmitting the form reuses it.
+    key = (request.headers.get('Idempotency-Key')
+           or request.form.get('idempotency_key') or '').strip()
+    if len(key) > MAX_KEY_LENGTH:
+        raise IdempotencyError('Idempotency keys are limited to {} characters.'.format(
+            MAX_KEY_LENGTH), 400, request.view_args.get('event_id'))
+    return key
+
+
+def replay(action, event_id):
+    # The stored outcome of an earlier request with this key, or None. Views
+    # call this first, so a retry is answered from one primary-key read
+    # without reading or writing Event or Booking.
+    key = request_key()
+    if not key:
+        return None
+    _sweep()
+    stored = db.session.execute(
+        sa.select(IdempotencyKey.action, IdempotencyKey.event_id, IdempotencyKey.outcome)
+        .where(IdempotencyKey.user_id == current_user.id, IdempotencyKey.key == key)).first()
+    if stored is None:
+        return None
+    if (stored.action, stored.event_id) != (action, event_id):
+        raise IdempotencyError('This idempotency key was already used for another request.',
+                               422, event_id)
+    return ReservationOutcome(stored.outcome)
+
+
+def idempotent(action, event_id, perform):
+    # Runs perform(record), which returns a ReservationOutcome and hands the
+    # outcome to record() inside its own transaction, so the key and the
+    # booking or cancellation commit together. A concurrent request with the
+    # same key loses on the key's primary key and gets the winner's outcome.
+    key = request_key()
+    if not key:
+        return perform(None)
+
+    user_id = current_user.id
+
+    def record(outcome):
+        db.session.execute(sa.insert(IdempotencyKey).values(
+            user_id=user_id, key=key, action=action, event_id=event_id,
+            outcome=outcome.value, created_at=_now()))
+
+    try:
+        return perform(record)
+    except IntegrityError:
+        db.session.rollback()
+        outcome = replay(action, event_id)
+        if outcome is None:
+            raise
+        return outcome
+
+
+def _sweep():
+    # Keys older than IDEMPOTENCY_TTL are deleted in one indexed statement,
+    # at most once per IDEMPOTENCY_SWEEP_INTERVAL per process.
+    global _next_sweep
+    now = time.monotonic()
+    with _sweep_lock:
+        if now < _next_sweep:
+            return
+        _next_sweep = now + current_app.config['IDEMPOTENCY_SWEEP_INTERVAL']
+    purge_expired()
+
+
+def purge_expired():
+    cutoff = _now() - timedelta(seconds=current_app.config['IDEMPOTENCY_TTL'])
+    purged = db.session.execute(
+        sa.delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff)
+        .execution_options(synchronize_session=False)).rowcount
+    db.session.commit()
+    return purged
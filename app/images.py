@@ -0,0 +1,174 @@
+import hashlib
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+import sqlalchemy as sa
+from flask import current_app
+from app import db, ALLOWED_EXTENSIONS
+from app.cache import cache
+from app.models import Event
+
+CHUNK_SIZE = 64 * 1024
+THUMBNAIL_DIR = 'thumbs'
+
+_SIGNATURES = {
+    'png': (b'\x89PNG\r\n\x1a\n',),
+    'jpg': (b'\xff\xd8\xff',),
+    'jpeg': (b'\xff\xd8\xff',),
+    'gif': (b'GIF87a', b'GIF89a'),
+}
+
+
+class UnsupportedImage(ValueError):
+    pass
+
+
+def make_thumbnail(source, target, size):
+    # Runs in a worker process: Pillow's decode and resize hold the GIL.
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size))
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            flat = Image.new('RGB', image.size, 'white')
+            flat.paste(image, mask=image.getchannel('A'))
+            image = flat
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        partial = target + '.part'
+        image.save(partial, 'JPEG', quality=82, optimize=True, progressive=True)
+    os.replace(partial, target)
+    return target
+
+
+class _PoolState:
+    def __init__(self):
+        self.lock = Lock()
+        self.pool = None
+
+
+class ImageStore:
+    # Uploads are stored once under the sha256 of their content, so the same
+    # picture attached to many events takes one file and one thumbnail.
+    # Thumbnails are built in a process pool, one per app
+    # (app.extensions['images']); events point at theirs once it exists.
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['images'] = _PoolState()
+
+    @property
+    def folder(self):
+        return current_app.config['UPLOAD_FOLDER']
+
+    def thumbnail_name(self, name):
+        return '{}/{}-{}.jpg'.format(THUMBNAIL_DIR, name.rsplit('.', 1)[0],
+                                     current_app.config['THUMBNAIL_SIZE'])
+
+    def save(self, storage):
+        extension = storage.filename.rsplit('.', 1)[-1].lower() if storage.filename else ''
+        if extension not in ALLOWED_EXTENSIONS:
+            raise UnsupportedImage('Only {} images are allowed.'.format(
+                ', '.join(sorted(ALLOWED_EXTENSIONS))))
+        os.makedirs(self.folder, exist_ok=True)
+
+        digest = hashlib.sha256()
+        handle, partial = tempfile.mkstemp(dir=self.folder, suffix='.part')
+        try:
+            with os.fdopen(handle, 'wb') as out:
+                first = True
+                while chunk := storage.stream.read(CHUNK_SIZE):
+                    if first and not chunk.startswith(_SIGNATURES[extension]):
+                        raise UnsupportedImage('The file is not a valid {} image.'.format(
+                            extension.upper()))
+                    first = False
+                    digest.update(chunk)
+                    out.write(chunk)
+            name = '{}.{}'.format(digest.hexdigest(), 'jpg' if extension == 'jpeg' else extension)
+            path = os.path.join(self.folder, name)
+            if os.path.exists(path):
+                os.remove(partial)
+            else:
+                os.replace(partial, path)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        return name
+
+    def ready_thumbnail(self, name):
+        thumbnail = self.thumbnail_name(name)
+        if os.path.exists(os.path.join(self.folder, thumbnail)):
+            return thumbnail
+        return None
+
+    def submit(self, name):
+        # Call after the events pointing at `name` are committed: the done
+        # callback attaches the thumbnail to them.
+        app = current_app._get_current_object()
+        source = os.path.join(self.folder, name)
+        target = os.path.join(self.folder, self.thumbnail_name(name))
+        size = app.config['THUMBNAIL_SIZE']
+        try:
+            future = self._executor(app).submit(make_thumbnail, source, target, size)
+        except BrokenProcessPool:
+            # A worker died (out of memory on a huge image, killed); start over.
+            self.shutdown()
+            future = self._executor(app).submit(make_thumbnail, source, target, size)
+        future.add_done_callback(lambda future: self._done(app, name, future))
+        return future
+
+    def _executor(self, app):
+        state = app.extensions['images']
+        with state.lock:
+            if state.pool is None:
+                # spawn: forking a threaded server process is not safe.
+                state.pool = ProcessPoolExecutor(
+                    app.config['THUMBNAIL_WORKERS'],
+                    mp_context=multiprocessing.get_context('spawn'))
+            return state.pool
+
+    def _done(self, app, name, future):
+        # Runs on the pool's callback thread, so it is handed its app.
+        with app.app_context():
+            if future.exception() is not None:
+                app.logger.error('Thumbnail for %s failed: %s', name, future.exception())
+                return
+            self.attach(name, self.thumbnail_name(name))
+
+    def attach(self, name, thumbnail):
+        event_ids = db.session.scalars(
+            sa.update(Event)
+            .where(Event.image == name, Event.thumbnail.is_distinct_from(thumbnail))
+            .values(thumbnail=thumbnail, version=Event.version + 1)
+            .returning(Event.event_id)
+            .execution_options(synchronize_session=False)).all()
+        db.session.commit()
+        for event_id in event_ids:
+            cache.invalidate_event(event_id)
+        if event_ids:
+            cache.invalidate_listings()
+        return len(event_ids)
+
+    def missing_thumbnails(self):
+        return db.session.scalars(
+            sa.select(Event.image).where(Event.image.is_not(None), Event.thumbnail.is_(None))
+            .distinct()).all()
+
+    def shutdown(self):
+        state = current_app.extensions['images']
+        with state.lock:
+            if state.pool is not None:
+                state.pool.shutdown(wait=False)
+                state.pool = None
+
+
+images = ImageStore()
@@ -0,0 +1,182 @@
+import json
+import threading
+import time
+from collections import Counter
+import sqlalchemy as sa
+from flask import current_app
+from werkzeug.exceptions import ServiceUnavailable, TooManyRequests
+from app import db
+from app.models import Event
+
+
+class _Channel:
+    # One per watched event. seq moves on every push; a deleted event is
+    # pushed as a None payload.
+    __slots__ = ('condition', 'seq', 'payload', 'watchers')
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.seq = 0
+        self.payload = None
+        self.watchers = 0
+
+    def push(self, payload):
+        with self.condition:
+            self.seq += 1
+            self.payload = payload
+            self.condition.notify_all()
+
+    def wait(self, seen, timeout):
+        with self.condition:
+            self.condition.wait_for(lambda: self.seq != seen, timeout)
+            return self.seq, self.payload
+
+
+class _FeedState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.channels = {}
+        self.dirty = set()
+        self.clients = Counter()
+        self.connections = 0
+        self.flusher = None
+        self.pushes = 0
+        self.rejected = 0
+
+
+class SeatFeed:
+    # In-process pub/sub for seats_left. Writers publish() after commit and
+    # a single flusher thread coalesces them: whatever changed during one
+    # LIVE_COALESCE_INTERVAL is read in one query and pushed once per event,
+    # however many bookings landed or clients are watching. Idle streams
+    # sleep on their channel and hold no database connection. Channels and
+    # the flusher belong to the app (app.extensions['seat_feed']).
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['seat_feed'] = _FeedState()
+
+    def publish(self, *event_ids):
+        app = current_app._get_current_object()
+        state = app.extensions['seat_feed']
+        with state.lock:
+            watched = [event_id for event_id in event_ids if event_id in state.channels]
+            if not watched:
+                return
+            state.dirty.update(watched)
+            if state.flusher is None:
+                state.flusher = threading.Thread(target=self._run, args=(app, state),
+                                                 name='seat-feed', daemon=True)
+                state.flusher.start()
+        state.wake.set()
+
+    def _run(self, app, state):
+        while True:
+            state.wake.wait()
+            with state.lock:
+                state.wake.clear()
+                dirty, state.dirty = state.dirty, set()
+            with app.app_context():
+                try:
+                    self.flush(dirty)
+                except Exception:
+                    app.logger.exception('seat feed error')
+            time.sleep(app.config['LIVE_COALESCE_INTERVAL'])
+
+    def flush(self, event_ids):
+        if not event_ids:
+            return
+        state = current_app.extensions['seat_feed']
+        rows = {row.event_id: row for row in db.session.execute(
+            sa.select(Event.event_id, Event.seats_left, Event.total_seats, Event.version)
+            .where(Event.event_id.in_(event_ids)))}
+        for event_id in event_ids:
+            with state.lock:
+                channel = state.channels.get(event_id)
+            if channel is None:
+                continue
+            row = rows.get(event_id)
+            channel.push(None if row is None else {
+                'seats_left': row.seats_left, 'total_seats': row.total_seats,
+                'version': row.version})
+            with state.lock:
+                state.pushes += 1
+
+    def subscribe(self, event_id, client):
+        config = current_app.config
+        state = current_app.extensions['seat_feed']
+        with state.lock:
+            if state.connections >= config['LIVE_MAX_CONNECTIONS']:
+                state.rejected += 1
+                raise ServiceUnavailable(retry_after=config['LIVE_RETRY_AFTER'])
+            if state.clients[client] >= config['LIVE_MAX_CONNECTIONS_PER_CLIENT']:
+                state.rejected += 1
+                raise TooManyRequests(retry_after=config['LIVE_RETRY_AFTER'])
+            state.clients[client] += 1
+            state.connections += 1
+            channel = state.channels.get(event_id)
+            if channel is None:
+                channel = state.channels[event_id] = _Channel()
+            channel.watchers += 1
+            # Taken before the caller reads its snapshot, so any push from
+            # then on is newer than the stream's starting point.
+            seen = channel.seq
+
+        closed = []
+
+        def unsubscribe():
+            # Called from the response's close hook, which runs whether or
+            # not the stream ever started.
+            with state.lock:
+                if closed:
+                    return
+                closed.append(True)
+                state.clients[client] -= 1
+                state.connections -= 1
+                if state.clients[client] <= 0:
+                    del state.clients[client]
+                channel.watchers -= 1
+                if channel.watchers <= 0 and state.channels.get(event_id) is channel:
+                    del state.channels[event_id]
+        return channel, seen, unsubscribe
+
+    def stream(self, channel, seen, initial):
+        # The body is iterated after the view has returned, outside the app
+        # context, so the settings are read here.
+        config = current_app.config
+        heartbeat = config['LIVE_HEARTBEAT_INTERVAL']
+        retry = config['LIVE_RETRY_AFTER'] * 1000
+
+        def events(seen):
+            yield 'retry: {}\n\n'.format(retry)
+            yield _message(initial)
+            while True:
+                seq, payload = channel.wait(seen, heartbeat)
+                if seq == seen:
+                    # Keeps proxies from closing the connection and lets the
+                    # server notice clients that have gone away.
+                    yield ': ping\n\n'
+                    continue
+                seen = seq
+                if payload is None:
+                    yield 'event: deleted\ndata: {}\n\n'
+                    return
+                yield _message(payload)
+        return events(seen)
+
+    def stats(self):
+        state = current_app.extensions['seat_feed']
+        with state.lock:
+            return {'connections': state.connections,
+                    'events': len(state.channels),
+                    'pushes': state.pushes, 'rejected': state.rejected}
+
+
+def _message(payload):
+    return 'id: {}\nevent: seats\ndata: {}\n\n'.format(payload['version'], json.dumps(payload))
+
+
+live = SeatFeed()
@@ -0,0 +1,217 @@
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict, deque
+from datetime import datetime, timezone
+import sqlalchemy as sa
+from flask import (Blueprint, current_app, g, request, has_app_context, has_request_context,
+                   abort)
+from flask_login import current_user
+from app.cache import cache
+from app.live import live
+from app.ratelimit import limiter
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+CACHE_GAUGES = ('entries',)
+
+bp = Blueprint('metrics', __name__)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield '{}_bucket{{{},le="{}"}} {}'.format(name, labels, bound, cumulative)
+        yield '{}_bucket{{{},le="+Inf"}} {}'.format(name, labels, self.count)
+        yield '{}_sum{{{}}} {}'.format(name, labels, round(self.sum, 6))
+        yield '{}_count{{{}}} {}'.format(name, labels, self.count)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _MetricsState:
+    def __init__(self, slow_query_log_size):
+        self.lock = threading.Lock()
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.query_counts = defaultdict(lambda: Histogram(QUERY_COUNT_BUCKETS))
+        self.requests = Counter()
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.slow_queries = deque(maxlen=slow_query_log_size)
+        self.slow_query_total = 0
+        self.first_request_seconds = None
+
+
+class Metrics:
+    # Everything recorded belongs to the app (app.extensions['metrics']), so
+    # each app in a process reports only its own requests and queries.
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['metrics'] = _MetricsState(app.config['SLOW_QUERY_LOG_SIZE'])
+
+    def observe_request(self, endpoint, method, status, seconds, queries):
+        state = current_app.extensions['metrics']
+        with state.lock:
+            state.latency[endpoint].observe(seconds)
+            state.query_counts[endpoint].observe(queries)
+            state.requests[(endpoint, method, status)] += 1
+            if state.first_request_seconds is None and 'startup' in current_app.extensions:
+                # From the start of create_app() to the end of the first
+                # request: what a cold serverless invocation pays.
+                state.first_request_seconds = (
+                    time.perf_counter() - current_app.extensions['startup']['created_at'])
+
+    def observe_query(self, statement, seconds):
+        state = current_app.extensions.get('metrics') if has_app_context() else None
+        if state is None:
+            return
+        with state.lock:
+            state.queries += 1
+            state.query_seconds += seconds
+        if seconds * 1000 < current_app.config['SLOW_QUERY_THRESHOLD_MS']:
+            return
+        entry = {'statement': statement, 'duration_ms': round(seconds * 1000, 3),
+                 'endpoint': request.endpoint if has_request_context() else None,
+                 'at': datetime.now(timezone.utc).isoformat()}
+        with state.lock:
+            state.slow_queries.append(entry)
+            state.slow_query_total += 1
+        current_app.logger.warning('Slow query (%.1f ms) in %s: %s',
+                                   entry['duration_ms'], entry['endpoint'], statement)
+
+    def slow_queries(self):
+        state = current_app.extensions['metrics']
+        with state.lock:
+            return list(state.slow_queries)
+
+    def render(self):
+        state = current_app.extensions['metrics']
+        lines = []
+        with state.lock:
+            lines.append('# TYPE http_request_duration_seconds histogram')
+            for endpoint, histogram in sorted(state.latency.items()):
+                lines.extend(histogram.render('http_request_duration_seconds',
+                                              'endpoint="{}"'.format(_label(endpoint))))
+            lines.append('# TYPE http_request_queries histogram')
+            for endpoint, histogram in sorted(state.query_counts.items()):
+                lines.extend(histogram.render('http_request_queries',
+                                              'endpoint="{}"'.format(_label(endpoint))))
+            lines.append('# TYPE http_requests_total counter')
+            for (endpoint, method, status), count in sorted(state.requests.items()):
+                lines.append('http_requests_total{{endpoint="{}",method="{}",status="{}"}} {}'
+                             .format(_label(endpoint), method, status, count))
+            lines.append('# TYPE db_queries_total counter')
+            lines.append('db_queries_total {}'.format(state.queries))
+            lines.append('# TYPE db_query_duration_seconds_total counter')
+            lines.append('db_query_duration_seconds_total {}'.format(
+                round(state.query_seconds, 6)))
+            lines.append('# TYPE db_slow_queries_total counter')
+            lines.append('db_slow_queries_total {}'.format(state.slow_query_total))
+            startup = current_app.extensions.get('startup')
+            if startup:
+                lines.append('# TYPE app_startup_seconds gauge')
+                for phase, seconds in startup['timings'].items():
+                    lines.append('app_startup_seconds{{phase="{}"}} {}'
+                                 .format(phase, round(seconds, 6)))
+            if state.first_request_seconds is not None:
+                lines.append('# TYPE app_first_request_seconds gauge')
+                lines.append('app_first_request_seconds {}'
+                             .format(round(state.first_request_seconds, 6)))
+        for key, value in sorted(cache.stats().items()):
+            if key in CACHE_GAUGES:
+                lines.append('# TYPE event_cache_{} gauge'.format(key))
+                lines.append('event_cache_{} {}'.format(key, value))
+            elif isinstance(value, int):
+                # Everything else only ever goes up.
+                lines.append('# TYPE event_cache_{}_total counter'.format(key))
+                lines.append('event_cache_{}_total {}'.format(key, value))
+        lines.append('# TYPE rate_limit_throttled_total counter')
+        lines.append('rate_limit_throttled_total {}'.format(limiter.throttled))
+        feed = live.stats()
+        lines.append('# TYPE seat_stream_connections gauge')
+        lines.append('seat_stream_connections {}'.format(feed['connections']))
+        lines.append('# TYPE seat_stream_pushes_total counter')
+        lines.append('seat_stream_pushes_total {}'.format(feed['pushes']))
+        lines.append('# TYPE seat_stream_rejected_total counter')
+        lines.append('seat_stream_rejected_total {}'.format(feed['rejected']))
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+@sa.event.listens_for(sa.engine.Engine, 'before_cursor_execute')
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context, which is dropped with the statement, so
+    # a statement that raises leaves nothing behind on the pooled connection.
+    context._query_started = time.perf_counter()
+
+
+@sa.event.listens_for(sa.engine.Engine, 'after_cursor_execute')
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    metrics.observe_query(statement, time.perf_counter() - context._query_started)
+    if has_request_context() and 'query_count' in g:
+        g.query_count += 1
+
+
+@bp.before_app_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+    g.query_count = 0
+
+
+@bp.after_app_request
+def _record_request(response):
+    if 'request_started' not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_started
+    metrics.observe_request(request.endpoint or 'unmatched', request.method,
+                            response.status_code, elapsed, g.query_count)
+    if current_app.config['METRICS_DEBUG_HEADER']:
+        response.headers['X-Query-Count'] = str(g.query_count)
+        response.headers['X-Response-Time-Ms'] = '{:.1f}'.format(elapsed * 1000)
+    return response
+
+
+def _require_metrics_access():
+    # Scrapers can't log in, so a bearer token is accepted as well as an
+    # admin session.
+    token = current_app.config['METRICS_TOKEN']
+    header = request.headers.get('Authorization', '')
+    if token and hmac.compare_digest(header, 'Bearer ' + token):
+        return
+    if not current_user.is_authenticated or current_user.role != 'admin':
+        abort(403)
+
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    _require_metrics_access()
+    return current_app.response_class(metrics.render(),
+                                      mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+@bp.route('/metrics/slow_queries')
+def slow_queries():
+    _require_metrics_access()
+    return {'threshold_ms': current_app.config['SLOW_QUERY_THRESHOLD_MS'],
+            'queries': metrics.slow_queries()}
@@ -1,7 +1,9 @@
+import functools
 from typing import Optional
 import sqlalchemy as sa
 import sqlalchemy.orm as so
-from app import db, login, app
+from flask import current_app
+from app import db
 from flask_login import UserMixin, login_manager
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timezone
@@ -23,31 +25,47 @@ class User(UserMixin, db.Model):
         return '<User {}>'.format(self.username)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(
+            password, method=current_app.config['PASSWORD_HASH_METHOD'])
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+    def password_needs_rehash(self):
+        # Hashes made with older or cheaper parameters are upgraded at login.
+        method = self.password_hash.split('$', 1)[0]
+        return method != _hash_method(current_app.config['PASSWORD_HASH_METHOD'])
+
     def get_reset_password_token(self, expires_in=600):
         return jwt.encode(
             {'reset_password': self.id, 'exp': time() + expires_in},
-            app.config['SECRET_KEY'], algorithm='HS256')
+            current_app.config['SECRET_KEY'], algorithm='HS256')
 
     @staticmethod
     def verify_reset_password_token(token):
         try:
-            id = jwt.decode(token, app.config['SECRET_KEY'],
+            id = jwt.decode(token, current_app.config['SECRET_KEY'],
                             algorithms='HS256')['reset_password']
         except:
             return
         return db.session.get(User, id)
 
-@login.user_loader
-def load_user(id):
-    return db.session.get(User, int(id))
+@functools.lru_cache
+def _hash_method(method):
+    # werkzeug fills in default parameters ('scrypt' -> 'scrypt:32768:8:1'),
+    # so compare against the prefix of a real hash.
+    return generate_password_hash('', method=method).split('$', 1)[0]
 
 
 class Event(db.Model):
+    __table_args__ = (
+        sa.Index('ix_event_date_time_event_id', 'date', 'time', 'event_id'),
+        sa.Index('ix_event_location_date_time_event_id', 'location', 'date', 'time', 'event_id'),
+        sa.Index('ix_event_available_date_time_event_id', 'date', 'time', 'event_id',
+                 sqlite_where=sa.text('seats_left > 0'),
+                 postgresql_where=sa.text('seats_left > 0')),
+    )
+
     event_id: so.Mapped[int] = so.mapped_column(primary_key=True)
     title: so.Mapped[str] = so.mapped_column(sa.String(128), index=True, unique=True)
     description: so.Mapped[str] = so.mapped_column(sa.String(256), index=True)
@@ -57,6 +75,14 @@ class Event(db.Model):
     total_seats: so.Mapped[int] = so.mapped_column()
     seats_left: so.Mapped[int] = so.mapped_column(default=0)
     created_by: so.Mapped[str] = so.mapped_column(sa.String(64))
+    on_sale_queue: so.Mapped[bool] = so.mapped_column(default=False, server_default=sa.false())
+    # Content-addressed file names under UPLOAD_FOLDER.
+    image: so.Mapped[Optional[str]] = so.mapped_column(sa.String(80))
+    thumbnail: so.Mapped[Optional[str]] = so.mapped_column(sa.String(96))
+    # Bumped by every write to the row; the API derives its ETags from it.
+    version: so.Mapped[int] = so.mapped_column(default=1, server_default='1')
+    # Set once every attendee's reminder has been queued.
+    reminder_sent_at: so.Mapped[Optional[datetime]] = so.mapped_column()
 
     bookings: so.Mapped[list["Booking"]] = so.relationship(back_populates="event",
                                                            cascade="all, delete-orphan")
@@ -66,13 +92,151 @@ class Event(db.Model):
 
 
 class Booking(db.Model):
+    __table_args__ = (
+        sa.UniqueConstraint('user_id', 'event_id', name='uq_booking_user_event'),
+        sa.Index('ix_booking_event_id_user_id', 'event_id', 'user_id'),
+        sa.Index('ix_booking_event_id_booking_id', 'event_id', 'booking_id'),
+    )
+
     booking_id: so.Mapped[int] = so.mapped_column(primary_key=True)
     user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('user.id'))
     event_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('event.event_id'))
+    seats: so.Mapped[int] = so.mapped_column(default=1, server_default='1')
     booked_at: so.Mapped[datetime] = so.mapped_column(default=lambda: datetime.now(timezone.utc))
+    reminded_at: so.Mapped[Optional[datetime]] = so.mapped_column()
 
     user: so.Mapped["User"] = so.relationship(back_populates="bookings")
     event: so.Mapped["Event"] = so.relationship(back_populates="bookings")
 
     def __repr__(self):
-        return '<User: {} Booking: {}>'.format(self.user_id, self.booking_id)
\ No newline at end of file
+        return '<User: {} Booking: {}>'.format(self.user_id, self.booking_id)
+
+class OutboundEmail(db.Model):
+    __tablename__ = 'outbound_email'
+    __table_args__ = (
+        sa.Index('ix_outbound_email_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    id: so.Mapped[int] = so.mapped_column(primary_key=True)
+    subject: so.Mapped[str] = so.mapped_column(sa.String(256))
+    sender: so.Mapped[str] = so.mapped_column(sa.String(128))
+    recipients: so.Mapped[list] = so.mapped_column(sa.JSON)
+    text_body: so.Mapped[str] = so.mapped_column(sa.Text)
+    html_body: so.Mapped[Optional[str]] = so.mapped_column(sa.Text)
+    status: so.Mapped[str] = so.mapped_column(sa.String(16), default='pending')
+    attempts: so.Mapped[int] = so.mapped_column(default=0)
+    next_attempt_at: so.Mapped[datetime] = so.mapped_column(default=lambda: datetime.now(timezone.utc))
+    claim_token: so.Mapped[Optional[str]] = so.mapped_column(sa.String(32))
+    claimed_at: so.Mapped[Optional[datetime]] = so.mapped_column()
+    last_error: so.Mapped[Optional[str]] = so.mapped_column(sa.String(256))
+    created_at: so.Mapped[datetime] = so.mapped_column(default=lambda: datetime.now(timezone.utc))
+    sent_at: so.Mapped[Optional[datetime]] = so.mapped_column()
+
+    def __repr__(self):
+        return '<OutboundEmail {} {}>'.format(self.id, self.status)
+
+
+
+class AdmissionRequest(db.Model):
+    __tablename__ = 'admission_request'
+    __table_args__ = (
+        sa.Index('ix_admission_request_status_id', 'status', 'id'),
+        sa.Index('ix_admission_request_event_id_status_id', 'event_id', 'status', 'id'),
+    )
+
+    id: so.Mapped[int] = so.mapped_column(primary_key=True)
+    token: so.Mapped[str] = so.mapped_column(sa.String(32), index=True, unique=True)
+    event_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('event.event_id'))
+    user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('user.id'))
+    seats: so.Mapped[int] = so.mapped_column(default=1, server_default='1')
+    status: so.Mapped[str] = so.mapped_column(sa.String(16), default='pending')
+    created_at: so.Mapped[datetime] = so.mapped_column(default=lambda: datetime.now(timezone.utc))
+    processed_at: so.Mapped[Optional[datetime]] = so.mapped_column()
+
+    def __repr__(self):
+        return '<AdmissionRequest {} {}>'.format(self.token, self.status)
+
+
+class EventStats(db.Model):
+    # Maintained in the same transaction as every booking and cancellation,
+    # so analytics never aggregate over the booking table. The pending counts
+    # are what app.stats.roll_up() has not yet moved into booking_stats_daily.
+    __tablename__ = 'event_stats'
+
+    event_id: so.Mapped[int] = so.mapped_column(
+        sa.ForeignKey('event.event_id', ondelete='CASCADE'), primary_key=True)
+    bookings: so.Mapped[int] = so.mapped_column(default=0, server_default='0')
+    cancellations: so.Mapped[int] = so.mapped_column(default=0, server_default='0')
+    pending_bookings: so.Mapped[int] = so.mapped_column(default=0, server_default='0')
+    pending_cancellations: so.Mapped[int] = so.mapped_column(default=0, server_default='0')
+    updated_at: so.Mapped[Optional[datetime]] = so.mapped_column()
+
+    def __repr__(self):
+        return '<EventStats {} {}>'.format(self.event_id, self.bookings)
+
+
+class DailyBookingStats(db.Model):
+    __tablename__ = 'booking_stats_daily'
+
+    day: so.Mapped[datetime.date] = so.mapped_column(sa.Date, primary_key=True)
+    bookings: so.Mapped[int] = so.mapped_column(default=0, server_default='0')
+    cancellations: so.Mapped[int] = so.mapped_column(default=0, server_default='0')
+
+    def __repr__(self):
+        return '<DailyBookingStats {} {}>'.format(self.day, self.bookings)
+
+
+class EventArchive(db.Model):
+    # Past events moved out of the hot event table by `flask events archive`.
+    __tablename__ = 'event_archive'
+
+    event_id: so.Mapped[int] = so.mapped_column(primary_key=True, autoincrement=False)
+    title: so.Mapped[str] = so.mapped_column(sa.String(128))
+    description: so.Mapped[str] = so.mapped_column(sa.String(256))
+    date: so.Mapped[datetime.date] = so.mapped_column(sa.Date, index=True)
+    time: so.Mapped[datetime.time] = so.mapped_column(sa.Time)
+    location: so.Mapped[str] = so.mapped_column(sa.String(30))
+    total_seats: so.Mapped[int] = so.mapped_column()
+    seats_left: so.Mapped[int] = so.mapped_column()
+    created_by: so.Mapped[str] = so.mapped_column(sa.String(64))
+    image: so.Mapped[Optional[str]] = so.mapped_column(sa.String(80))
+    thumbnail: so.Mapped[Optional[str]] = so.mapped_column(sa.String(96))
+    version: so.Mapped[int] = so.mapped_column(default=1, server_default='1')
+    # The event's EventStats counters, which go with it into the archive.
+    bookings: so.Mapped[int] = so.mapped_column(default=0, server_default='0')
+    cancellations: so.Mapped[int] = so.mapped_column(default=0, server_default='0')
+    archived_at: so.Mapped[datetime] = so.mapped_column(default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return '<EventArchive {}>'.format(self.title)
+
+
+class BookingArchive(db.Model):
+    __tablename__ = 'booking_archive'
+
+    booking_id: so.Mapped[int] = so.mapped_column(primary_key=True, autoincrement=False)
+    user_id: so.Mapped[int] = so.mapped_column(index=True)
+    event_id: so.Mapped[int] = so.mapped_column(index=True)
+    seats: so.Mapped[int] = so.mapped_column(default=1, server_default='1')
+    booked_at: so.Mapped[Optional[datetime]] = so.mapped_column()
+    archived_at: so.Mapped[datetime] = so.mapped_column(default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return '<BookingArchive {} {}>'.format(self.user_id, self.booking_id)
+
+
+class IdempotencyKey(db.Model):
+    # The outcome of a booking or cancellation, keyed by the client's
+    # Idempotency-Key, so a retry is answered without redoing the write.
+    __tablename__ = 'idempotency_key'
+
+    user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('user.id'), primary_key=True)
+    key: so.Mapped[str] = so.mapped_column(sa.String(64), primary_key=True)
+    action: so.Mapped[str] = so.mapped_column(sa.String(16))
+    event_id: so.Mapped[int] = so.mapped_column()
+    outcome: so.Mapped[str] = so.mapped_column(sa.String(16))
+    created_at: so.Mapped[datetime] = so.mapped_column(default=lambda: datetime.now(timezone.utc),
+                                                       index=True)
+
+    def __repr__(self):
+        return '<IdempotencyKey {} {}>'.format(self.user_id, self.key)
@@ -0,0 +1,78 @@
+from collections import namedtuple
+from datetime import date, time
+import sqlalchemy as sa
+from flask import current_app
+from app import db
+from app.models import Event
+
+EventPage = namedtuple('EventPage', ['items', 'next_cursor'])
+
+
+class EventFilters(namedtuple('EventFilters', ['date_from', 'date_to', 'location', 'has_seats'])):
+    def args(self):
+        # Query-string form, for links that keep the filters across pages.
+        args = {'date_from': self.date_from.isoformat() if self.date_from else None,
+                'date_to': self.date_to.isoformat() if self.date_to else None,
+                'location': self.location,
+                'has_seats': 1 if self.has_seats else None}
+        return {key: value for key, value in args.items() if value is not None}
+
+# Only what the event cards render, so listing pages never hydrate full
+# Event objects.
+EVENT_CARD_COLUMNS = (Event.event_id, Event.title, Event.description,
+                      Event.date, Event.time, Event.location, Event.thumbnail,
+                      Event.version)
+EVENT_ORDER = (Event.date, Event.time, Event.event_id)
+
+
+def encode_cursor(row):
+    return '{}_{}_{}'.format(row.date.isoformat(), row.time.isoformat(), row.event_id)
+
+
+def decode_cursor(cursor):
+    try:
+        d, t, event_id = cursor.split('_')
+        return date.fromisoformat(d), time.fromisoformat(t), int(event_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def listing_filters(args):
+    # Listings start from today unless an earlier date is asked for.
+    return EventFilters(date_from=parse_date(args.get('date_from')) or date.today(),
+                        date_to=parse_date(args.get('date_to')),
+                        location=args.get('location', '').strip() or None,
+                        has_seats=args.get('has_seats', '') not in ('', '0'))
+
+
+def event_page(cursor=None, per_page=None, columns=EVENT_CARD_COLUMNS, filters=None):
+    per_page = per_page or current_app.config['EVENTS_PER_PAGE']
+    query = sa.select(*columns).order_by(*EVENT_ORDER)
+    if filters is not None:
+        # Each combination is served by an index led by the filtered column:
+        # ix_event_date_time_event_id, ix_event_location_date_time_event_id
+        # and the partial ix_event_available_date_time_event_id.
+        if filters.date_from:
+            query = query.where(Event.date >= filters.date_from)
+        if filters.date_to:
+            query = query.where(Event.date <= filters.date_to)
+        if filters.location:
+            query = query.where(Event.location == filters.location)
+        if filters.has_seats:
+            query = query.where(Event.seats_left > 0)
+
+    position = decode_cursor(cursor)
+    if position is not None:
+        query = query.where(sa.tuple_(*EVENT_ORDER) > position)
+
+    rows = db.session.execute(query.limit(per_page + 1)).all()
+    if len(rows) > per_page:
+        return EventPage(rows[:per_page], encode_cursor(rows[per_page - 1]))
+    return EventPage(rows, None)
@@ -0,0 +1,178 @@
+import math
+import threading
+import time
+from array import array
+from functools import wraps
+from flask import current_app, request
+from werkzeug.exceptions import TooManyRequests
+from werkzeug.utils import import_string
+
+
+# Interface for rate limit storage. A shared backend (redis, ...) only has
+# to implement hit() and peek() and be named in RATELIMIT_STORAGE.
+class RateLimitStorage:
+    def __init__(self, config):
+        self.config = config
+
+    # Counts one request against key and returns the seconds to wait, or 0.
+    def hit(self, key, limit, window):
+        raise NotImplementedError
+
+    # Returns the seconds to wait, or 0, without counting anything.
+    def peek(self, key, limit, window):
+        raise NotImplementedError
+
+
+class MemoryStorage(RateLimitStorage):
+    # Each key keeps a ring of RATELIMIT_BUCKETS counters spanning its
+    # window, so the sliding count costs a few dozen bytes per key however
+    # many requests arrive. Keys idle for a whole window are swept out.
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.buckets = config['RATELIMIT_BUCKETS']
+        self.sweep_interval = config['RATELIMIT_SWEEP_INTERVAL']
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + self.sweep_interval
+        self.evictions = 0
+
+    def hit(self, key, limit, window, now=None):
+        return self._check(key, limit, window, now, count=True)
+
+    def peek(self, key, limit, window, now=None):
+        return self._check(key, limit, window, now, count=False)
+
+    def _check(self, key, limit, window, now, count):
+        now = time.monotonic() if now is None else now
+        width = window / self.buckets
+        tick = int(now // width)
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            entry = self._counters.get(key)
+            if entry is None:
+                if not count:
+                    return 0
+                entry = self._counters[key] = [tick, window, array('I', bytes(4 * self.buckets))]
+            last, _, counts = entry
+            if tick - last >= self.buckets:
+                counts[:] = array('I', bytes(4 * self.buckets))
+            else:
+                for skipped in range(last + 1, tick + 1):
+                    counts[skipped % self.buckets] = 0
+            entry[0] = tick
+
+            if sum(counts) >= limit:
+                # Wait until enough of the oldest buckets fall out of the window.
+                excess = sum(counts) - limit + 1
+                for age in range(self.buckets - 1, -1, -1):
+                    excess -= counts[(tick - age) % self.buckets]
+                    if excess <= 0:
+                        return max(1, math.ceil((tick - age + self.buckets) * width - now))
+            if count:
+                counts[tick % self.buckets] += 1
+            return 0
+
+    def _sweep(self, now):
+        idle = [key for key, (last, window, _) in self._counters.items()
+                if (last + 1) * window / self.buckets + window <= now]
+        for key in idle:
+            del self._counters[key]
+        self.evictions += len(idle)
+        self._next_sweep = now + self.sweep_interval
+
+    def __len__(self):
+        return len(self._counters)
+
+
+class _LimiterState:
+    def __init__(self, storage):
+        self.storage = storage
+        self.lock = threading.Lock()
+        self.throttled = 0
+
+
+class RateLimiter:
+    # Storage and counters belong to the app (app.extensions['ratelimit']).
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['ratelimit'] = _LimiterState(
+            import_string(app.config['RATELIMIT_STORAGE'])(app.config))
+
+    @property
+    def storage(self):
+        return current_app.extensions['ratelimit'].storage
+
+    @property
+    def throttled(self):
+        return current_app.extensions['ratelimit'].throttled
+
+    def _limit(self, scope, kind):
+        return current_app.config['RATELIMIT_{}_PER_{}'.format(scope.upper(), kind.upper())]
+
+    def check(self, scope, identities, count=True):
+        # identities: (kind, value) pairs, e.g. ('ip', '10.0.0.1'); each has
+        # its own limit under RATELIMIT_<SCOPE>_PER_<KIND> as (count, seconds).
+        # With count=False the limits are only looked at, not spent.
+        if not current_app.config['RATELIMIT_ENABLED']:
+            return
+        state = current_app.extensions['ratelimit']
+        wait = 0
+        for kind, value in identities:
+            if not value:
+                continue
+            key = '{}:{}:{}'.format(scope, kind, value)
+            if count:
+                wait = max(wait, state.storage.hit(key, *self._limit(scope, kind)))
+            else:
+                wait = max(wait, state.storage.peek(key, *self._limit(scope, kind)))
+        if wait:
+            with state.lock:
+                state.throttled += 1
+            current_app.logger.warning('Throttled %s from %s', scope, client_address())
+            raise TooManyRequests(retry_after=wait)
+
+    def record_failure(self, scope, account):
+        # Spends one attempt from the account's limit; see rate_limited().
+        account = _account(account)
+        if current_app.config['RATELIMIT_ENABLED'] and account:
+            self.storage.hit('{}:account:{}'.format(scope, account),
+                             *self._limit(scope, 'account'))
+
+
+def client_address():
+    # The real client once ProxyFix has applied X-Forwarded-For from the
+    # PROXY_FIX_X_FOR trusted proxies; the socket peer otherwise.
+    return request.remote_addr
+
+
+def _account(value):
+    return (value or '').strip().lower()
+
+
+def rate_limited(scope, account_field=None, failures_only=False):
+    # Runs before the view, so a throttled POST never reaches the database,
+    # the password hasher or the mail queue. With failures_only the account
+    # limit is only checked here and the view spends it through
+    # limiter.record_failure(), so requests alone cannot lock an account.
+    def decorator(view):
+        @wraps(view)
+        def decorated_function(*args, **kwargs):
+            if request.method == 'POST':
+                identities = [('ip', client_address())]
+                account = _account(request.form.get(account_field)) if account_field else None
+                if account and failures_only:
+                    limiter.check(scope, identities)
+                    limiter.check(scope, [('account', account)], count=False)
+                else:
+                    limiter.check(scope, identities + [('account', account)])
+            return view(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+limiter = RateLimiter()
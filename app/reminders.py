@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta, timezone
+import sqlalchemy as sa
+from flask import current_app, render_template
+from app import db
+from app.email import outbox
+from app.models import Event, Booking, User, OutboundEmail
+from app.workers import BatchWorker
+
+
+def _starting_between(start, end):
+    # Events store a naive local date and time; comparing the pair keeps the
+    # query on ix_event_date_time_event_id.
+    return sa.and_(
+        sa.or_(Event.date > start.date(),
+               sa.and_(Event.date == start.date(), Event.time >= start.time())),
+        sa.or_(Event.date < end.date(),
+               sa.and_(Event.date == end.date(), Event.time <= end.time())))
+
+
+class ReminderScheduler(BatchWorker):
+    # Each pass finds the events starting within REMINDER_WINDOW_HOURS and
+    # queues a reminder per booking on the outbox, REMINDER_BATCH_SIZE
+    # attendees per transaction. Bookings are marked reminded_at in the same
+    # transaction as their mail, so a restart resumes where it stopped and
+    # nobody is mailed twice.
+    name = 'reminders'
+    workers_setting = 'REMINDER_WORKERS'
+    poll_setting = 'REMINDER_POLL_INTERVAL'
+
+    def due_events(self, now=None):
+        now = now or datetime.now()
+        end = now + timedelta(hours=current_app.config['REMINDER_WINDOW_HOURS'])
+        return db.session.scalars(
+            sa.select(Event).where(_starting_between(now, end),
+                                   Event.reminder_sent_at.is_(None))
+            .order_by(Event.date, Event.time, Event.event_id)).all()
+
+    def remind(self, event):
+        subject = 'Reminder: {} starts soon'.format(event.title)
+        sender = current_app.config['ADMINS'][0]
+        text_body = render_template('email/event_reminder.txt', event=event)
+        html_body = render_template('email/event_reminder.html', event=event)
+        batch_size = current_app.config['REMINDER_BATCH_SIZE']
+
+        queued = 0
+        after = 0
+        while True:
+            chunk = db.session.execute(
+                sa.select(Booking.booking_id, User.email)
+                .join(User, User.id == Booking.user_id)
+                .where(Booking.event_id == event.event_id, Booking.booking_id > after,
+                       Booking.reminded_at.is_(None))
+                .order_by(Booking.booking_id)
+                .limit(batch_size)).all()
+            if not chunk:
+                break
+            after = chunk[-1].booking_id
+
+            now = datetime.now(timezone.utc)
+            claimed = set(db.session.scalars(
+                sa.update(Booking)
+                .where(Booking.booking_id.in_([row.booking_id for row in chunk]),
+                       Booking.reminded_at.is_(None))
+                .values(reminded_at=now)
+                .returning(Booking.booking_id)
+                .execution_options(synchronize_session=False)))
+            rows = [{'subject': subject, 'sender': sender, 'recipients': [row.email],
+                     'text_body': text_body, 'html_body': html_body,
+                     'status': 'pending', 'attempts': 0, 'next_attempt_at': now,
+                     'created_at': now}
+                    for row in chunk if row.booking_id in claimed]
+            if rows:
+                db.session.execute(sa.insert(OutboundEmail), rows)
+            db.session.commit()
+            queued += len(rows)
+            if rows:
+                outbox.notify()
+
+        db.session.execute(
+            sa.update(Event).where(Event.event_id == event.event_id)
+            .values(reminder_sent_at=datetime.now(timezone.utc))
+            .execution_options(synchronize_session=False))
+        db.session.commit()
+        return queued
+
+    def process_batch(self):
+        queued = 0
+        for event in self.due_events():
+            sent = self.remind(event)
+            current_app.logger.info('Queued %d reminder(s) for event %d', sent, event.event_id)
+            queued += sent
+        return queued
+
+reminders = ReminderScheduler()
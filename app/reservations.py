@@ -0,0 +1,145 @@
+import enum
+import sqlalchemy as sa
+from flask import g
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.cache import cache
+from app.live import live
+from app.models import Event, Booking
+from app.stats import record_bookings, record_cancellation
+
+
+class ReservationOutcome(enum.Enum):
+    BOOKED = 'booked'
+    CANCELLED = 'cancelled'
+    ALREADY_BOOKED = 'already_booked'
+    NOT_BOOKED = 'not_booked'
+    SOLD_OUT = 'sold_out'
+    NOT_FOUND = 'not_found'
+
+
+def _event_exists(event_id):
+    return db.session.scalar(
+        sa.select(Event.event_id).where(Event.event_id == event_id)) is not None
+
+
+def _bookings_changed(user_id, event_ids, availability_changed=False):
+    # Listings filter on seats_left > 0, so they only go stale when an event
+    # sells out or gets seats back from zero.
+    for event_id in event_ids:
+        cache.invalidate_event(event_id)
+    cache.invalidate_bookings(user_id)
+    if availability_changed:
+        cache.invalidate_listings()
+    g.pop('booked_event_ids', None)
+    live.publish(*event_ids)
+
+
+def booked_event_ids(user):
+    # Computed once per request and cached per user between requests, so
+    # listings, detail pages and my_bookings share a single lookup.
+    if not user.is_authenticated:
+        return frozenset()
+    if 'booked_event_ids' not in g:
+        g.booked_event_ids = frozenset(cache.booked_event_ids(user.id))
+    return g.booked_event_ids
+
+
+def _refused(outcome, record):
+    # Nothing was written; only the caller's record, if any, is committed.
+    if record is not None:
+        record(outcome)
+        db.session.commit()
+    return outcome
+
+
+def reserve_seat(user_id, event_id, seats=1, record=None):
+    return reserve_seats(user_id, {event_id: seats}, record)[0]
+
+
+def reserve_seats(user_id, seats_by_event, record=None):
+    # The booking rows go in first so a duplicate is rejected by the unique
+    # constraint before any event row is touched. Each event's seats are then
+    # taken with a single conditional UPDATE, which keeps the write lock on
+    # the event row as short as possible and can never oversell. Any event
+    # that cannot take its seats rolls back the whole group, so a batch is
+    # booked entirely or not at all. Returns the outcome and, on failure,
+    # the event that caused it. record(outcome), when given, is called in
+    # the same transaction (see app.idempotency).
+    event_ids = sorted(seats_by_event)
+    try:
+        db.session.execute(sa.insert(Booking), [
+            {'user_id': user_id, 'event_id': event_id, 'seats': seats_by_event[event_id]}
+            for event_id in event_ids])
+    except IntegrityError:
+        db.session.rollback()
+        return (_refused(ReservationOutcome.ALREADY_BOOKED, record),
+                _first_booked(user_id, event_ids))
+
+    sold_out = False
+    for event_id in event_ids:
+        seats = seats_by_event[event_id]
+        left = db.session.execute(
+            sa.update(Event)
+            .where(Event.event_id == event_id, Event.seats_left >= seats)
+            .values(seats_left=Event.seats_left - seats, version=Event.version + 1)
+            .returning(Event.seats_left)
+            .execution_options(synchronize_session=False)).scalar()
+
+        if left is None:
+            db.session.rollback()
+            if not _event_exists(event_id):
+                return _refused(ReservationOutcome.NOT_FOUND, record), event_id
+            return _refused(ReservationOutcome.SOLD_OUT, record), event_id
+        sold_out = sold_out or left == 0
+
+    for event_id in event_ids:
+        record_bookings(event_id, seats_by_event[event_id])
+    if record is not None:
+        record(ReservationOutcome.BOOKED)
+    db.session.commit()
+    _bookings_changed(user_id, event_ids, sold_out)
+    return ReservationOutcome.BOOKED, None
+
+
+def _first_booked(user_id, event_ids):
+    return db.session.scalar(
+        sa.select(Booking.event_id)
+        .where(Booking.user_id == user_id, Booking.event_id.in_(event_ids))
+        .order_by(Booking.event_id).limit(1))
+
+
+def release_seat(user_id, event_id, record=None):
+    # Cancelling gives back every seat the booking holds. The booking row is
+    # already gone, so the seats are always returned, capped at total_seats
+    # in the same statement rather than guarded by a WHERE that could skip
+    # the update and lose them.
+    seats = db.session.execute(
+        sa.delete(Booking)
+        .where(Booking.user_id == user_id, Booking.event_id == event_id)
+        .returning(Booking.seats)).scalar()
+
+    if seats is None:
+        db.session.rollback()
+        return _refused(ReservationOutcome.NOT_BOOKED, record)
+
+    left = db.session.execute(
+        sa.update(Event)
+        .where(Event.event_id == event_id)
+        .values(seats_left=sa.case(
+                    (Event.seats_left + seats > Event.total_seats, Event.total_seats),
+                    else_=Event.seats_left + seats),
+                version=Event.version + 1)
+        .returning(Event.seats_left)
+        .execution_options(synchronize_session=False)).scalar()
+    if left is None:
+        db.session.rollback()
+        return _refused(ReservationOutcome.NOT_FOUND, record)
+    record_cancellation(event_id, seats)
+    if record is not None:
+        record(ReservationOutcome.CANCELLED)
+    db.session.commit()
+    # At most `seats` left now means there were none before (or the return
+    # was capped, where an extra invalidation is harmless).
+    _bookings_changed(user_id, [event_id], left <= seats)
+    return ReservationOutcome.CANCELLED
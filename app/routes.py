@@ -1,45 +1,70 @@
-from app import app, db
-from flask import url_for, redirect, render_template, flash, request
+import uuid
+from app import db
+from flask import Blueprint, current_app, url_for, redirect, render_template, flash, request, abort, Response, stream_with_context, send_from_directory
 from flask_login import current_user, login_user, logout_user, current_user, login_required
 import sqlalchemy as sa
-from app.models import User, Event, Booking
+from app.models import User, Event
 from app.forms import LoginForm, RegistrationForm, CreationForm, ResetPasswordRequestForm, ResetPasswordForm
 from urllib.parse import urlsplit
+from werkzeug.datastructures import FileStorage
 from app.utils import admin_required
+from app.database import read_only
 from app.email import send_password_reset_email
-
-@app.route('/')
-@app.route('/index')
+from app.admin import filters_from_args, booking_page, iter_csv, iter_json
+from app.admission import admission
+from app.cache import cache
+from app.ratelimit import client_address, limiter, rate_limited
+from app.idempotency import idempotent, replay, IdempotencyError
+from app.images import images, UnsupportedImage
+from app.live import live
+from app.search import find_events
+from app.stats import analytics, forget_event
+from app.pagination import EVENT_CARD_COLUMNS, EVENT_ORDER, listing_filters
+from app.reservations import reserve_seat, release_seat, booked_event_ids, ReservationOutcome
+
+bp = Blueprint('main', __name__)
+
+@bp.route('/')
+@bp.route('/index')
 @login_required
 def index():
-    events = Event.query.all()
-    return render_template('index.html', title='Homepage', events=events)
-
-@app.route('/login', methods=['GET', 'POST'])
+    filters = listing_filters(request.args)
+    page = cache.event_page(request.args.get('after'), filters)
+    return render_template('index.html', title='Homepage', events=page.items,
+                           next_cursor=page.next_cursor, filters=filters,
+                           booked=booked_event_ids(current_user))
+
+@bp.route('/login', methods=['GET', 'POST'])
+@rate_limited('login', account_field='username', failures_only=True)
 def login():
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     form = LoginForm()
     if form.validate_on_submit():
         user = db.session.scalar(
             sa.select(User).where(User.username == form.username.data))
         if user is None or not user.check_password(form.password.data):
+            limiter.record_failure('login', form.username.data)
             flash('Invalid login or password.')
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
+        if user.password_needs_rehash():
+            user.set_password(form.password.data)
+            db.session.commit()
         login_user(user, remember=form.remember_me.data)
         next_page = request.args.get('next')
-        return redirect(next_page or url_for('index'))
+        return redirect(next_page or url_for('main.index'))
     return render_template('login.html', title='Sign In', form=form)
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     logout_user()
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
+@rate_limited('register')
 def register():
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     form = RegistrationForm()
     if form.validate_on_submit():
         user = User(username=form.username.data, email=form.email.data)
@@ -47,15 +72,44 @@ def register():
         db.session.add(user)
         db.session.commit()
         flash('Congratulations! You are now registered.')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     return render_template('register.html', title='Registration', form=form)
 
-@app.route('/create_event', methods=['GET', 'POST'])
+def _save_image(form):
+    # Swaps the uploaded file for its stored name; False leaves the error on
+    # the form.
+    if not isinstance(form.image.data, FileStorage) or not form.image.data:
+        form.image.data = None
+        return True
+    try:
+        form.image.data = images.save(form.image.data)
+    except UnsupportedImage as error:
+        form.image.errors.append(str(error))
+        return False
+    return True
+
+def _thumbnail_for(image):
+    return images.ready_thumbnail(image) if image else None
+
+def _queue_thumbnail(event):
+    if event.image and event.thumbnail is None:
+        images.submit(event.image)
+
+@bp.route('/media/<path:filename>')
+def media(filename):
+    # File names are content hashes, so a URL never changes meaning.
+    response = send_from_directory(current_app.config['UPLOAD_FOLDER'], filename,
+                                   max_age=current_app.config['MEDIA_MAX_AGE'])
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@bp.route('/create_event', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def create_event():
     form = CreationForm()
-    if form.validate_on_submit():
+    if form.validate_on_submit() and _save_image(form):
         event = Event(title=form.title.data,
                       description=form.description.data,
                       date=form.date.data,
@@ -63,161 +117,255 @@ def create_event():
                       time=form.time.data,
                       total_seats=form.total_seats.data,
                       seats_left=form.total_seats.data,
+                      on_sale_queue=form.on_sale_queue.data,
+                      image=form.image.data,
+                      thumbnail=_thumbnail_for(form.image.data),
                       created_by=current_user.username)
         db.session.add(event)
         db.session.commit()
+        _queue_thumbnail(event)
+        cache.invalidate_listings()
         flash('Congratulations, your event was successfully added!')
-        return redirect(url_for('events'))
+        return redirect(url_for('main.events'))
     return render_template('create_event.html', title='Create an event', form=form)
 
-@app.route('/events')
+@bp.route('/events')
+@read_only
 def events():
-    events = Event.query.all()
-    return render_template('events.html', events=events)
-
-@app.route('/event/<int:event_id>')
+    filters = listing_filters(request.args)
+    page = cache.event_page(request.args.get('after'), filters)
+    return render_template('events.html', events=page.items,
+                           next_cursor=page.next_cursor, filters=filters,
+                           booked=booked_event_ids(current_user))
+
+@bp.route('/event/<int:event_id>')
+@read_only
 def event_detail(event_id):
-    event = Event.query.get_or_404(event_id)
-    is_booked = Booking.query.filter_by(
-        user_id=current_user.id, event_id=event_id
-    ).first() is not None
-    return render_template('event_detail.html', event=event, is_booked=is_booked)
-
-@app.route('/book_event/<int:event_id>', methods=["POST"])
+    event = cache.event(event_id)
+    if event is None:
+        abort(404)
+    is_booked = event_id in booked_event_ids(current_user)
+    return render_template('event_detail.html', event=event, is_booked=is_booked,
+                           idempotency_key=uuid.uuid4().hex)
+
+@bp.route('/event/<int:event_id>/seats')
+def event_seats(event_id):
+    # Subscribe before reading, so a booking committed in between is pushed
+    # rather than lost, even before the client starts reading the stream.
+    channel, seen, unsubscribe = live.subscribe(event_id, client_address())
+    event = cache.event(event_id)
+    if event is None:
+        unsubscribe()
+        abort(404)
+    initial = {key: event[key] for key in ('seats_left', 'total_seats', 'version')}
+    response = Response(live.stream(channel, seen, initial), mimetype='text/event-stream')
+    response.call_on_close(unsubscribe)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@bp.route('/book_event/<int:event_id>', methods=["POST"])
 @login_required
 def book_event(event_id):
-    event = Event.query.get_or_404(event_id)
-
-    existing_booking = Booking.query.filter_by(user_id=current_user.id,
-                                               event_id=event_id).first()
-
-    if existing_booking:
+    seats = request.form.get('seats', 1, type=int)
+    if not 1 <= seats <= current_app.config['MAX_SEATS_PER_BOOKING']:
+        flash('You can book between 1 and {} seats at once.'.format(
+            current_app.config['MAX_SEATS_PER_BOOKING']), 'warning')
+        return redirect(url_for('main.event_detail', event_id=event_id))
+
+    outcome = replay('book', event_id)
+    if outcome is None:
+        event = cache.event(event_id)
+        if event is None:
+            abort(404)
+        if event['on_sale_queue']:
+            ticket = admission.enqueue(current_user.id, event_id, seats)
+            return redirect(url_for('main.admission_status', token=ticket.token))
+        outcome = idempotent('book', event_id, lambda record: reserve_seat(
+            current_user.id, event_id, seats, record))
+
+    if outcome is ReservationOutcome.NOT_FOUND:
+        abort(404)
+    if outcome is ReservationOutcome.ALREADY_BOOKED:
         flash('You already booked this event.', 'warning')
-        return redirect(url_for('event_detail', event_id=event_id))
-
-    if event.seats_left <= 0:
-        flash('Sorry, no seats are left for this event', 'warning')
-        return redirect(url_for('event_detail', event_id=event_id))
-
-    event.seats_left -= 1
-
-    new_booking = Booking(user_id=current_user.id, event_id=event_id)
-    db.session.add(new_booking)
-    db.session.commit()
-
-    flash('Event booked successfully!')
+    elif outcome is ReservationOutcome.SOLD_OUT:
+        flash('Sorry, not enough seats are left for this event', 'warning')
+    else:
+        flash('Event booked successfully!')
 
-    return redirect(url_for('event_detail', event_id=event_id))
+    return redirect(url_for('main.event_detail', event_id=event_id))
 
-@app.route('/cancel_booking/<int:event_id>', methods=['POST'])
+@bp.route('/admission/<token>')
+@login_required
+def admission_status(token):
+    status = admission.status(token, current_user.id)
+    if status is None:
+        abort(404)
+    if request.accept_mimetypes.best == 'application/json':
+        return status
+    return render_template('admission_status.html', title='Booking queue', **status)
+
+@bp.route('/cancel_booking/<int:event_id>', methods=['POST'])
+@login_required
 def cancel_booking(event_id):
-    booking = Booking.query.filter_by(
-        user_id=current_user.id, event_id=event_id).first_or_404()
+    outcome = replay('cancel', event_id) or idempotent(
+        'cancel', event_id, lambda record: release_seat(current_user.id, event_id, record))
 
-    db.session.delete(booking)
-
-    event = Event.query.get_or_404(event_id)
-    event.seats_left += 1
-
-    db.session.commit()
+    if outcome in (ReservationOutcome.NOT_BOOKED, ReservationOutcome.NOT_FOUND):
+        abort(404)
 
     flash('Your booking has been cancelled.', 'success')
 
-    return redirect(url_for('event_detail', event_id=event_id))
+    return redirect(url_for('main.event_detail', event_id=event_id))
+
+@bp.errorhandler(IdempotencyError)
+def idempotency_error(error):
+    flash(error.message, 'warning')
+    return redirect(url_for('main.event_detail', event_id=error.event_id))
 
-@app.route('/my_bookings')
+@bp.route('/my_bookings')
 @login_required
+@read_only
 def my_bookings():
-    my_events = Event.query.join(Booking).filter(Booking.user_id == current_user.id).all()
+    my_events = db.session.execute(
+        sa.select(*EVENT_CARD_COLUMNS)
+        .where(Event.event_id.in_(booked_event_ids(current_user)))
+        .order_by(*EVENT_ORDER)).all()
     return render_template('my_bookings.html', events=my_events)
 
-@app.route('/adm_db')
+@bp.route('/adm_db')
 @login_required
 @admin_required
 def admin_dashboard():
-    bookings = (
-        db.session.query(Booking).join(User, Booking.user_id == User.id).
-        join(Event, Booking.event_id == Event.event_id).all()
-    )
-    return render_template('admin_dashboard.html', bookings=bookings)
+    filters = filters_from_args(request.args)
+    page = booking_page(filters, before=request.args.get('before', type=int))
+    return render_template('admin_dashboard.html', bookings=page.items,
+                           next_cursor=page.next_cursor, filters=filters)
 
-@app.route('/search')
+@bp.route('/adm_db/analytics')
+@login_required
+@admin_required
+@read_only
+def booking_analytics():
+    days = min(request.args.get('days', current_app.config['ANALYTICS_DAYS'], type=int), 366)
+    report = analytics(max(days, 1), current_app.config['ANALYTICS_TOP_EVENTS'])
+    if request.accept_mimetypes.best == 'application/json':
+        return report
+    return render_template('analytics.html', title='Booking analytics', report=report)
+
+@bp.route('/adm_db/export.<any(csv, json):fmt>')
+@login_required
+@admin_required
+def export_bookings(fmt):
+    filters = filters_from_args(request.args)
+    if fmt == 'csv':
+        rows, mimetype = iter_csv(filters), 'text/csv'
+    else:
+        rows, mimetype = iter_json(filters), 'application/json'
+    return Response(stream_with_context(rows), mimetype=mimetype, headers={
+        'Content-Disposition': 'attachment; filename=bookings.' + fmt})
+
+@bp.route('/search')
+@read_only
 def search_events():
     query = request.args.get('q', '').strip()
 
-    if query:
-        events = Event.query.filter(
-            Event.title.ilike(f"%{query}%") |
-            Event.description.ilike(f"%{query}%")
-        ).all()
-    else:
-        events = []
+    events = find_events(query) if query else []
 
     return render_template('search_events.html', events=events, query=query)
 
-@app.route('/delete_event/<int:event_id>', methods=['POST'])
+@bp.route('/delete_event/<int:event_id>', methods=['POST'])
 @login_required
 @admin_required
 def delete_event(event_id):
     event = Event.query.filter_by(event_id=event_id).first_or_404()
+    attendees = [booking.user_id for booking in event.bookings]
 
+    forget_event(event_id)
     db.session.delete(event)
     db.session.commit()
+    cache.invalidate_event(event_id)
+    cache.invalidate_listings()
+    cache.invalidate_bookings(*attendees)
+    live.publish(event_id)
     flash('Event successfully has been deleted.')
 
-    return redirect(url_for('events'))
+    return redirect(url_for('main.events'))
 
 
-@app.route('/edit_event/<int:event_id>', methods=['GET', 'POST'])
+@bp.route('/edit_event/<int:event_id>', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def edit_event(event_id):
     event = Event.query.filter_by(event_id=event_id).first_or_404()
     form = CreationForm(obj=event)
 
-    if form.validate_on_submit():
+    if form.validate_on_submit() and _save_image(form):
+        # Seats already booked stay booked: only the change in capacity is
+        # applied to seats_left, in SQL, so concurrent bookings are kept.
+        booked = event.total_seats - event.seats_left
+        if form.total_seats.data < booked:
+            flash('{} seats are already booked; total seats cannot be lower.'.format(booked),
+                  'warning')
+            return render_template('edit_event.html', event_id=event_id, form=form)
+        event.seats_left = Event.seats_left + (form.total_seats.data - event.total_seats)
         event.title = form.title.data
         event.description = form.description.data
-        event.date = form.date.data,
+        event.date = form.date.data
         event.location = form.location.data
         event.time = form.time.data
         event.total_seats = form.total_seats.data
-        event.seats_left = form.total_seats.data
+        event.on_sale_queue = form.on_sale_queue.data
+        if form.image.data:
+            event.image = form.image.data
+            event.thumbnail = _thumbnail_for(form.image.data)
+        event.version = Event.version + 1
         event.created_by = current_user.username
 
         db.session.commit()
+        _queue_thumbnail(event)
+        cache.invalidate_event(event_id)
+        cache.invalidate_listings()
+        live.publish(event_id)
 
         flash('Your event has been successfully edited!', 'success')
 
-        return redirect(url_for('events'))
+        return redirect(url_for('main.events'))
     return render_template('edit_event.html', event_id=event_id, form=form)
 
 
-@app.route('/reset_password_request', methods=['GET', 'POST'])
+@bp.route('/reset_password_request', methods=['GET', 'POST'])
+@rate_limited('reset', account_field='email')
 def reset_password_request():
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     reset_form = ResetPasswordRequestForm()
     if reset_form.validate_on_submit():
-        user = db.session.scalar(sa.select(User.email == reset_form.email.data))
+        user = db.session.scalar(sa.select(User).where(User.email == reset_form.email.data))
         if user:
             send_password_reset_email(user)
         flash('Check your email to follow instruction to reset the password')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     return render_template('reset_password_request.html', title='Reset Password', form=reset_form)
 
-@app.route('/reset_password/<token>', methods=['GET', 'POST'])
+@bp.route('/reset_password/<token>', methods=['GET', 'POST'])
 def reset_password(token):
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     user = User.verify_reset_password_token(token)
     if not user:
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     form = ResetPasswordForm()
     if form.validate_on_submit():
         user.set_password(form.pwd1.data)
         db.session.commit()
         flash('Your password has been reset.')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     return render_template('reset_password.html', form=form)
 
+@bp.route('/adm_db/cache')
+@login_required
+@admin_required
+def cache_stats():
+    return cache.stats()
+
@@ -0,0 +1,187 @@
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from heapq import nlargest
+import sqlalchemy as sa
+from flask import current_app
+from app import db
+from app.models import Event
+from app.pagination import EVENT_CARD_COLUMNS
+
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+# External-content FTS5 table over event(title, description). The triggers
+# keep it in sync with every write to the event table, including bulk Core
+# statements that bypass the ORM. Seat updates don't touch title or
+# description, so they never reindex a row.
+FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS event_fts USING fts5("
+    "title, description, content='event', content_rowid='event_id')",
+    "CREATE TRIGGER IF NOT EXISTS event_fts_ai AFTER INSERT ON event BEGIN "
+    "INSERT INTO event_fts(rowid, title, description) "
+    "VALUES (new.event_id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS event_fts_ad AFTER DELETE ON event BEGIN "
+    "INSERT INTO event_fts(event_fts, rowid, title, description) "
+    "VALUES ('delete', old.event_id, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS event_fts_au AFTER UPDATE OF title, description ON event BEGIN "
+    "INSERT INTO event_fts(event_fts, rowid, title, description) "
+    "VALUES ('delete', old.event_id, old.title, old.description); "
+    "INSERT INTO event_fts(rowid, title, description) "
+    "VALUES (new.event_id, new.title, new.description); END",
+)
+
+event_fts = sa.table('event_fts', sa.column('rowid'))
+
+
+def tokenize(text):
+    return _TOKEN.findall((text or '').lower())
+
+
+def fts5_available(connection):
+    return connection.dialect.name == 'sqlite' and bool(connection.exec_driver_sql(
+        "SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar())
+
+
+@sa.event.listens_for(Event.__table__, 'after_create')
+def _create_fts_index(target, connection, **kw):
+    if fts5_available(connection):
+        for statement in FTS_DDL:
+            connection.exec_driver_sql(statement)
+
+
+# In-process fallback for databases without FTS5. It is kept in sync through
+# ORM events, so it only sees writes made by this process.
+class InvertedIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = defaultdict(dict)
+        self._documents = {}
+        self._terms = []
+
+    def _add(self, event_id, title, description):
+        weights = defaultdict(float)
+        for token in tokenize(title):
+            weights[token] += TITLE_WEIGHT
+        for token in tokenize(description):
+            weights[token] += DESCRIPTION_WEIGHT
+        for token, weight in weights.items():
+            self._postings[token][event_id] = weight
+        self._documents[event_id] = tuple(weights)
+
+    def _remove(self, event_id):
+        for token in self._documents.pop(event_id, ()):
+            postings = self._postings[token]
+            postings.pop(event_id, None)
+            if not postings:
+                del self._postings[token]
+
+    def load(self, rows):
+        with self._lock:
+            for row in rows:
+                self._add(row.event_id, row.title, row.description)
+            self._terms = sorted(self._postings)
+
+    def upsert(self, event_id, title, description):
+        with self._lock:
+            self._remove(event_id)
+            self._add(event_id, title, description)
+            self._terms = sorted(self._postings)
+
+    def remove(self, event_id):
+        with self._lock:
+            self._remove(event_id)
+            self._terms = sorted(self._postings)
+
+    def _prefix_scores(self, prefix):
+        scores = defaultdict(float)
+        i = bisect_left(self._terms, prefix)
+        while i < len(self._terms) and self._terms[i].startswith(prefix):
+            for event_id, weight in self._postings[self._terms[i]].items():
+                scores[event_id] += weight
+            i += 1
+        return scores
+
+    def search(self, tokens, limit):
+        with self._lock:
+            totals = None
+            for token in tokens:
+                scores = self._prefix_scores(token)
+                if totals is None:
+                    totals = scores
+                else:
+                    totals = {event_id: totals[event_id] + score
+                              for event_id, score in scores.items() if event_id in totals}
+                if not totals:
+                    return []
+        ranked = nlargest(limit, totals.items(), key=lambda item: (item[1], -item[0]))
+        return [event_id for event_id, _ in ranked]
+
+
+# Both keyed by engine, so apps on different databases keep apart.
+_fallbacks = {}
+_fallback_lock = threading.Lock()
+_fts_enabled = {}
+
+
+def _use_fts():
+    engine = db.engine
+    if engine not in _fts_enabled:
+        with engine.connect() as connection:
+            _fts_enabled[engine] = fts5_available(connection) and sa.inspect(
+                connection).has_table('event_fts')
+    return _fts_enabled[engine]
+
+
+def _fallback_index():
+    engine = db.engine
+    with _fallback_lock:
+        index = _fallbacks.get(engine)
+        if index is None:
+            index = InvertedIndex()
+            index.load(db.session.execute(
+                sa.select(Event.event_id, Event.title, Event.description)))
+            _fallbacks[engine] = index
+    return index
+
+
+@sa.event.listens_for(Event, 'after_insert')
+@sa.event.listens_for(Event, 'after_update')
+def _index_event(mapper, connection, target):
+    index = _fallbacks.get(connection.engine)
+    if index is not None:
+        index.upsert(target.event_id, target.title, target.description)
+
+
+@sa.event.listens_for(Event, 'after_delete')
+def _unindex_event(mapper, connection, target):
+    index = _fallbacks.get(connection.engine)
+    if index is not None:
+        index.remove(target.event_id)
+
+
+def find_events(query, limit=None):
+    limit = limit or current_app.config['SEARCH_RESULT_LIMIT']
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+
+    if _use_fts():
+        match = ' '.join('"{}"*'.format(token) for token in tokens)
+        return db.session.execute(
+            sa.select(*EVENT_CARD_COLUMNS)
+            .join(event_fts, event_fts.c.rowid == Event.event_id)
+            .where(sa.text('event_fts MATCH :match').bindparams(match=match))
+            .order_by(sa.func.bm25(sa.literal_column('event_fts'),
+                                   TITLE_WEIGHT, DESCRIPTION_WEIGHT))
+            .limit(limit)).all()
+
+    event_ids = _fallback_index().search(tokens, limit)
+    if not event_ids:
+        return []
+    rows = {row.event_id: row for row in db.session.execute(
+        sa.select(*EVENT_CARD_COLUMNS).where(Event.event_id.in_(event_ids)))}
+    return [rows[event_id] for event_id in event_ids if event_id in rows]
@@ -0,0 +1,200 @@
+from datetime import datetime, timedelta, timezone
+import sqlalchemy as sa
+from flask import current_app
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models import Event, Booking, EventStats, DailyBookingStats, EventArchive
+from app.workers import BatchWorker
+
+
+def _today():
+    return datetime.now(timezone.utc).date()
+
+
+def _bump(model, key, deltas, extra=None):
+    # Counters are bumped with one INSERT .. ON CONFLICT DO UPDATE, so the
+    # first booking of an event or a day needs no existence check.
+    extra = extra or {}
+    dialect = db.engine.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = (sqlite if dialect == 'sqlite' else postgresql).insert(model).values(
+            **key, **{column: max(delta, 0) for column, delta in deltas.items()}, **extra)
+        set_ = {column: getattr(model, column) + delta for column, delta in deltas.items()}
+        db.session.execute(insert.on_conflict_do_update(
+            index_elements=list(key), set_=dict(set_, **extra)))
+        return
+
+    where = [getattr(model, column) == value for column, value in key.items()]
+    updated = db.session.execute(
+        sa.update(model).where(*where)
+        .values(**{column: getattr(model, column) + delta for column, delta in deltas.items()},
+                **extra)
+        .execution_options(synchronize_session=False))
+    if updated.rowcount == 0:
+        db.session.execute(sa.insert(model).values(
+            **key, **{column: max(delta, 0) for column, delta in deltas.items()}, **extra))
+
+
+# Bookings only write their own event's stats row. The day's totals are a
+# single row every booking would contend on, so each event row also counts
+# what is still pending, and roll_up() moves that into the daily bucket in
+# batches, off the booking path.
+def record_bookings(event_id, count=1):
+    _bump(EventStats, {'event_id': event_id}, {'bookings': count, 'pending_bookings': count},
+          {'updated_at': datetime.now(timezone.utc)})
+    rollup.start()
+
+
+def record_cancellation(event_id, count=1):
+    _bump(EventStats, {'event_id': event_id},
+          {'bookings': -count, 'cancellations': count, 'pending_cancellations': count},
+          {'updated_at': datetime.now(timezone.utc)})
+    rollup.start()
+
+
+def roll_up(event_ids=None, limit=None):
+    # Adds the pending counts to today's bucket in the caller's transaction.
+    # What was read is subtracted rather than zeroed, so bookings landing
+    # meanwhile stay pending, and overlapping passes can only shift counts
+    # between passes, never lose them. Returns the event rows rolled up.
+    query = sa.select(EventStats.event_id, EventStats.pending_bookings,
+                      EventStats.pending_cancellations).where(
+        sa.or_(EventStats.pending_bookings != 0, EventStats.pending_cancellations != 0))
+    if event_ids is not None:
+        query = query.where(EventStats.event_id.in_(event_ids))
+    if limit:
+        query = query.order_by(EventStats.event_id).limit(limit)
+    rows = db.session.execute(query).all()
+    if not rows:
+        return 0
+
+    stats = EventStats.__table__
+    db.session.execute(
+        stats.update().where(stats.c.event_id == sa.bindparam('b_event_id'))
+        .values(pending_bookings=stats.c.pending_bookings - sa.bindparam('b_bookings'),
+                pending_cancellations=(stats.c.pending_cancellations
+                                       - sa.bindparam('b_cancellations'))),
+        [{'b_event_id': row.event_id, 'b_bookings': row.pending_bookings,
+          'b_cancellations': row.pending_cancellations} for row in rows])
+    _bump(DailyBookingStats, {'day': _today()},
+          {'bookings': sum(row.pending_bookings for row in rows),
+           'cancellations': sum(row.pending_cancellations for row in rows)})
+    return len(rows)
+
+
+class StatsRollup(BatchWorker):
+    # Rolls pending counts into booking_stats_daily every
+    # STATS_ROLLUP_INTERVAL, STATS_ROLLUP_BATCH_SIZE events per transaction.
+    name = 'stats'
+    workers_setting = 'STATS_ROLLUP_WORKERS'
+    poll_setting = 'STATS_ROLLUP_INTERVAL'
+
+    def process_batch(self):
+        batch_size = current_app.config['STATS_ROLLUP_BATCH_SIZE']
+        rolled = roll_up(limit=batch_size)
+        db.session.commit()
+        # A short batch means the backlog is gone: wait for the interval
+        # instead of chasing every new booking.
+        return rolled if rolled >= batch_size else 0
+
+
+rollup = StatsRollup()
+
+
+def forget_event(event_id):
+    roll_up([event_id])
+    db.session.execute(sa.delete(EventStats).where(EventStats.event_id == event_id))
+
+
+def analytics(days, top):
+    # All-time totals cover archived events too; the top list is live only.
+    live = db.session.execute(
+        sa.select(sa.func.coalesce(sa.func.sum(EventStats.bookings), 0),
+                  sa.func.coalesce(sa.func.sum(EventStats.cancellations), 0))).one()
+    archived = db.session.execute(
+        sa.select(sa.func.coalesce(sa.func.sum(EventArchive.bookings), 0),
+                  sa.func.coalesce(sa.func.sum(EventArchive.cancellations), 0),
+                  sa.func.coalesce(sa.func.sum(EventArchive.total_seats), 0))).one()
+    totals = (live[0] + archived[0], live[1] + archived[1])
+    seats = archived[2] + db.session.scalar(
+        sa.select(sa.func.coalesce(sa.func.sum(Event.total_seats), 0)))
+
+    fill_rate = EventStats.bookings * 1.0 / sa.func.nullif(Event.total_seats, 0)
+    top_events = db.session.execute(
+        sa.select(Event.event_id, Event.title, Event.date, Event.total_seats,
+                  EventStats.bookings, EventStats.cancellations, fill_rate.label('fill_rate'))
+        .join(EventStats, EventStats.event_id == Event.event_id)
+        .order_by(EventStats.bookings.desc(), Event.event_id)
+        .limit(top)).all()
+
+    today = _today()
+    first_day = today - timedelta(days=days - 1)
+    buckets = {row.day: (row.bookings, row.cancellations) for row in db.session.execute(
+        sa.select(DailyBookingStats.day, DailyBookingStats.bookings,
+                  DailyBookingStats.cancellations)
+        .where(DailyBookingStats.day >= first_day))}
+    # Counts not rolled up yet are today's.
+    pending = db.session.execute(
+        sa.select(sa.func.coalesce(sa.func.sum(EventStats.pending_bookings), 0),
+                  sa.func.coalesce(sa.func.sum(EventStats.pending_cancellations), 0))).one()
+    rolled = buckets.get(today, (0, 0))
+    buckets[today] = (rolled[0] + pending[0], rolled[1] + pending[1])
+    daily = []
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        bookings, cancellations = buckets.get(day, (0, 0))
+        daily.append({'day': day.isoformat(), 'bookings': bookings,
+                      'cancellations': cancellations})
+
+    return {
+        'bookings': totals[0],
+        'cancellations': totals[1],
+        'seats': seats,
+        'fill_rate': round(totals[0] / seats, 4) if seats else None,
+        'top_events': [{'id': row.event_id, 'title': row.title,
+                        'date': row.date.isoformat(), 'total_seats': row.total_seats,
+                        'bookings': row.bookings, 'cancellations': row.cancellations,
+                        'fill_rate': round(row.fill_rate, 4) if row.fill_rate is not None else None}
+                       for row in top_events],
+        'daily': daily,
+    }
+
+
+def rebuild():
+    # Counts are in seats. Per-event counts are recomputed exactly. Cancelled
+    # bookings are deleted from the booking table, so cancellation counts are
+    # kept and a day's booking count can only be raised to what survives.
+    # Pending counts are rolled up first so every bucket is complete.
+    roll_up()
+    now = datetime.now(timezone.utc)
+    active = (sa.select(sa.func.coalesce(sa.func.sum(Booking.seats), 0))
+              .where(Booking.event_id == EventStats.event_id).scalar_subquery())
+    db.session.execute(sa.update(EventStats).values(bookings=active, updated_at=now)
+                       .execution_options(synchronize_session=False))
+    db.session.execute(sa.delete(EventStats).where(
+        ~sa.exists().where(Event.event_id == EventStats.event_id)))
+    db.session.execute(sa.insert(EventStats).from_select(
+        ['event_id', 'bookings', 'cancellations', 'updated_at'],
+        sa.select(Booking.event_id, sa.func.sum(Booking.seats), sa.literal(0),
+                  sa.literal(now, sa.DateTime))
+        .where(~sa.exists().where(EventStats.event_id == Booking.event_id))
+        .group_by(Booking.event_id)))
+
+    day = sa.func.date(Booking.booked_at)
+    surviving = db.session.execute(
+        sa.select(day, sa.func.sum(Booking.seats)).group_by(day)).all()
+    stored = {row.day: row for row in db.session.scalars(sa.select(DailyBookingStats))}
+    raised = 0
+    for value, count in surviving:
+        value = value if not isinstance(value, str) else datetime.fromisoformat(value).date()
+        row = stored.get(value)
+        if row is None:
+            db.session.add(DailyBookingStats(day=value, bookings=count, cancellations=0))
+            raised += 1
+        elif row.bookings < count:
+            row.bookings = count
+            raised += 1
+
+    db.session.commit()
+    events = db.session.scalar(sa.select(sa.func.count()).select_from(EventStats))
+    return events, raised
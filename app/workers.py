@@ -0,0 +1,73 @@
+from threading import Event, Lock, Thread
+from flask import current_app
+from app import db
+
+
+class _WorkerState:
+    def __init__(self):
+        self.wake = Event()
+        self.lock = Lock()
+        self.workers = []
+
+
+class BatchWorker:
+    # Base for the background queues: a fixed pool of daemon threads that call
+    # process_batch() until it finds no work, then sleep until notify() or
+    # the poll interval. Subclasses name their config keys. The pool belongs
+    # to the app (app.extensions['workers'][name]), so every app in a process
+    # runs its own; process_batch() runs in that app's context.
+    name = 'worker'
+    workers_setting = None
+    poll_setting = None
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # Worker threads are only started on the first notify() or start(),
+        # never at import time.
+        app.extensions.setdefault('workers', {})[self.name] = _WorkerState()
+
+    def notify(self):
+        self.start()
+        current_app.extensions['workers'][self.name].wake.set()
+
+    def start(self, workers=None):
+        app = current_app._get_current_object()
+        state = app.extensions['workers'][self.name]
+        if workers is None:
+            workers = app.config[self.workers_setting]
+        with state.lock:
+            if state.workers or workers <= 0:
+                return state.workers
+            for i in range(workers):
+                worker = Thread(target=self._run, args=(app, state),
+                                name='{}-{}'.format(self.name, i), daemon=True)
+                worker.start()
+                state.workers.append(worker)
+            return state.workers
+
+    def _run(self, app, state):
+        while True:
+            with app.app_context():
+                try:
+                    done = self.process_batch()
+                except Exception:
+                    app.logger.exception('%s worker error', self.name)
+                    db.session.rollback()
+                    done = 0
+            if not done:
+                state.wake.wait(app.config[self.poll_setting])
+                state.wake.clear()
+
+    def process_batch(self):
+        raise NotImplementedError
+
+    def drain(self):
+        total = 0
+        while True:
+            done = self.process_batch()
+            if not done:
+                return total
+            total += done
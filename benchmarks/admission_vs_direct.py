@@ -0,0 +1,106 @@
+"""On-sale admission queue vs direct booking.
+
+Releases a crowd of logged-in test clients at one event twice: once with
+the direct conditional-UPDATE path and once with on-sale mode, where
+requests are queued and admitted in batches. Reports request throughput
+and latency percentiles for both, plus how long the queue took to settle.
+
+    python -m benchmarks.admission_vs_direct --users 400 --seats 100
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, time as dtime
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--seats', type=int, default=100)
+    return parser.parse_args(argv)
+
+
+def storm(app, user_ids, event_id):
+    barrier = threading.Barrier(len(user_ids) + 1)
+    samples = []
+    lock = threading.Lock()
+
+    def book(user_id):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        barrier.wait()
+        started = time.perf_counter()
+        client.post('/book_event/{}'.format(event_id))
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            samples.append(elapsed)
+
+    threads = [threading.Thread(target=book, args=(uid,)) for uid in user_ids]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix='admission-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'admission.db')
+
+    import sqlalchemy as sa
+    from app import create_app, db
+    app = create_app()
+    from app.models import User, Event, Booking, AdmissionRequest
+    from benchmarks.stats import summarize
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        db.create_all()
+        db.session.execute(sa.insert(User), [
+            {'username': f'fan{i}', 'email': f'fan{i}@example.com', 'role': 'user'}
+            for i in range(args.users)])
+        db.session.execute(sa.insert(Event), [
+            {'title': title, 'description': 'Benchmark event', 'date': date.today(),
+             'time': dtime(20, 0), 'location': 'Arena', 'total_seats': args.seats,
+             'seats_left': args.seats, 'created_by': 'bench', 'on_sale_queue': queued}
+            for title, queued in (('Direct', False), ('Queued', True))])
+        db.session.commit()
+        user_ids = db.session.scalars(sa.select(User.id)).all()
+        direct_id, queued_id = db.session.scalars(
+            sa.select(Event.event_id).order_by(Event.event_id)).all()
+
+    report = {'users': args.users, 'seats': args.seats}
+    samples, elapsed = storm(app, user_ids, direct_id)
+    report['direct'] = summarize(samples, elapsed)
+
+    started = time.perf_counter()
+    samples, elapsed = storm(app, user_ids, queued_id)
+    report['queued'] = summarize(samples, elapsed)
+    with app.app_context():
+        while db.session.scalar(sa.select(sa.func.count(AdmissionRequest.id))
+                                .where(AdmissionRequest.status == 'pending')):
+            db.session.rollback()
+            time.sleep(0.01)
+        report['queued']['settled_s'] = round(time.perf_counter() - started, 3)
+
+        for name, event_id in (('direct', direct_id), ('queued', queued_id)):
+            report[name]['booked'] = db.session.scalar(
+                sa.select(sa.func.count(Booking.booking_id)).where(Booking.event_id == event_id))
+            report[name]['seats_left'] = db.session.scalar(
+                sa.select(Event.seats_left).where(Event.event_id == event_id))
+
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""Event grid render benchmark.
+
+Seeds a throwaway SQLite database, then renders events.html with a grid of
+--cards event cards: with the fragment cache off, on but cold, and warm.
+Also times compiling every template into a fresh Jinja environment with
+and without the on-disk bytecode cache.
+
+    python -m benchmarks.card_render --cards 1000 --repeat 20
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+
+from benchmarks import seed as seeding
+from benchmarks.stats import summarize
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cards', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args(argv)
+
+
+def time_renders(app, render, repeat):
+    samples = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        begun = time.perf_counter()
+        with app.test_request_context('/events'):
+            render()
+        samples.append((time.perf_counter() - begun) * 1000)
+    return summarize(samples, time.perf_counter() - started)
+
+
+def time_compile(app, bytecode_cache):
+    from jinja2 import Environment
+
+    options = dict(app.jinja_options, loader=app.jinja_loader,
+                   bytecode_cache=bytecode_cache)
+    started = time.perf_counter()
+    environment = Environment(**options)
+    for name in app.jinja_loader.list_templates():
+        if name.endswith('.html'):
+            environment.get_template(name)
+    return round((time.perf_counter() - started) * 1000, 3)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    seeding.use_temp_database('card-render-')
+
+    from flask import render_template
+    from jinja2 import FileSystemBytecodeCache
+    from app import create_app, db
+    from app.cache import cache, MemoryCache, NullCache
+    from app.pagination import event_page, listing_filters
+
+    app = create_app()
+    with app.app_context():
+        seeding.seed(db, users=10, events=args.cards, bookings=0, seed=args.seed)
+        page = event_page(per_page=args.cards, filters=listing_filters({'date_from': '2000-01-01'}))
+        events = [row._asdict() for row in page.items]
+
+    def render():
+        return render_template('events.html', events=events, next_cursor=None,
+                               filters=listing_filters({}), booked=frozenset())
+
+    report = {'cards': len(events), 'repeat': args.repeat}
+    state = app.extensions['event_cache']
+    state.backend = NullCache(app.config)
+    report['uncached'] = time_renders(app, render, args.repeat)
+    state.backend = MemoryCache(dict(app.config, CACHE_MAX_ENTRIES=args.cards * 4))
+    state.counts.clear()
+    report['cold'] = time_renders(app, render, 1)
+    report['warm'] = time_renders(app, render, args.repeat)
+    with app.app_context():
+        report['fragments'] = {key: value for key, value in cache.stats().items()
+                               if key.startswith('fragment')}
+
+    bytecode_cache = FileSystemBytecodeCache(tempfile.mkdtemp(prefix='jinja-'))
+    report['compile_ms'] = {'no_cache': time_compile(app, None),
+                            'bytecode_cold': time_compile(app, bytecode_cache),
+                            'bytecode_warm': time_compile(app, bytecode_cache)}
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,247 @@
+"""Seeded load-test suite for the main pages.
+
+Seeds a throwaway SQLite database, then runs the browse, search, book storm
+and admin dashboard scenarios twice: in-process through the Flask test
+client, and over real HTTP against a local threaded server. Prints
+throughput and latency percentiles per driver and scenario as JSON, so the
+output of two runs with the same --seed can be diffed.
+
+    python -m benchmarks.load_suite --requests 2000 --concurrency 16
+    python -m benchmarks.load_suite --drivers http --scenarios browse search
+"""
+import argparse
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time as dtime
+
+from benchmarks import seed as seeding
+from benchmarks.search_latency import QUERIES
+from benchmarks.stats import summarize
+
+SCENARIOS = ('browse', 'search', 'book_storm', 'admin')
+DRIVERS = ('client', 'http')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    seeding.add_arguments(parser)
+    parser.add_argument('--requests', type=int, default=1000,
+                        help='requests per scenario (book storm: bookers)')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--drivers', nargs='+', choices=DRIVERS, default=DRIVERS)
+    return parser.parse_args(argv)
+
+
+def session_cookie(app, user_id):
+    # A signed session that Flask-Login accepts, so no password hashing
+    # (or login request) sits on the measured path.
+    value = app.session_interface.get_signing_serializer(app).dumps(
+        {'_user_id': str(user_id), '_fresh': True})
+    return '{}={}'.format(app.config['SESSION_COOKIE_NAME'], value)
+
+
+class ClientDriver:
+    name = 'client'
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, cookie=None):
+        if not hasattr(self._local, 'client'):
+            self._local.client = self.app.test_client(use_cookies=False)
+        headers = {'Cookie': cookie} if cookie else {}
+        return self._local.client.open(path, method=method, headers=headers).status_code
+
+    def close(self):
+        pass
+
+
+class HTTPDriver:
+    name = 'http'
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def request(self, method, path, cookie=None):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        try:
+            connection.request(method, path, headers={'Cookie': cookie} if cookie else {})
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        finally:
+            connection.close()
+
+    def close(self):
+        self.server.shutdown()
+
+
+def run(driver, jobs, concurrency):
+    samples = []
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def send(job):
+        method, path, cookie = job
+        started = time.perf_counter()
+        try:
+            status = driver.request(method, path, cookie)
+        except OSError:
+            status = 'error'
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            samples.append(elapsed)
+            statuses[str(status)] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(send, jobs))
+    report = summarize(samples, time.perf_counter() - started)
+    report['statuses'] = dict(statuses)
+    return report
+
+
+class Scenarios:
+    def __init__(self, app, db, rng, size):
+        import sqlalchemy as sa
+        from app.models import User, Event
+        from app.pagination import encode_cursor
+
+        self.app = app
+        self.db = db
+        self.rng = rng
+        self.size = size
+        with app.app_context():
+            self.user_ids = db.session.scalars(
+                sa.select(User.id).where(User.role == 'user').order_by(User.id)).all()
+            self.admin_id = db.session.scalar(sa.select(User.id).where(User.role == 'admin'))
+            rows = db.session.execute(
+                sa.select(Event.event_id, Event.date, Event.time)).all()
+        self.event_ids = [row.event_id for row in rows]
+        self.cursors = [encode_cursor(row) for row in rng.sample(rows, min(len(rows), 200))]
+        self._cookies = {}
+
+    def cookie(self, user_id):
+        if user_id not in self._cookies:
+            self._cookies[user_id] = session_cookie(self.app, user_id)
+        return self._cookies[user_id]
+
+    def browse(self, count):
+        jobs = []
+        for _ in range(count):
+            cookie = self.cookie(self.rng.choice(self.user_ids))
+            pick = self.rng.random()
+            if pick < 0.3:
+                path = '/events'
+            elif pick < 0.5:
+                path = '/events?after=' + self.rng.choice(self.cursors)
+            else:
+                path = '/event/{}'.format(self.rng.choice(self.event_ids))
+            jobs.append(('GET', path, cookie))
+        return jobs
+
+    def search(self, count):
+        return [('GET', '/search?q=' + self.rng.choice(QUERIES).replace(' ', '+'), None)
+                for _ in range(count)]
+
+    def admin(self, count):
+        cookie = self.cookie(self.admin_id)
+        jobs = []
+        for _ in range(count):
+            pick = self.rng.random()
+            if pick < 0.4:
+                path = '/adm_db'
+            elif pick < 0.7:
+                path = '/adm_db?event_id={}'.format(self.rng.choice(self.event_ids))
+            else:
+                path = '/adm_db?username=user{}'.format(self.rng.randrange(len(self.user_ids)))
+            jobs.append(('GET', path, cookie))
+        return jobs
+
+    def book_storm(self, count):
+        # A fresh event with fewer seats than bookers, hit by distinct users.
+        import sqlalchemy as sa
+        from app.models import Event
+
+        bookers = self.user_ids[:count]
+        seats = max(1, len(bookers) // 2)
+        with self.app.app_context():
+            event_id = self.db.session.execute(sa.insert(Event).values(
+                title='Storm {}'.format(time.time_ns()), description='Load test',
+                date=date.today(), time=dtime(20, 0), location='Arena',
+                total_seats=seats, seats_left=seats, created_by='bench')
+            ).inserted_primary_key[0]
+            self.db.session.commit()
+        self.storm_event = (event_id, seats)
+        return [('POST', '/book_event/{}'.format(event_id), self.cookie(user_id))
+                for user_id in bookers]
+
+    def check_storm(self):
+        import sqlalchemy as sa
+        from app.models import Event, Booking
+
+        event_id, seats = self.storm_event
+        with self.app.app_context():
+            seats_left = self.db.session.scalar(
+                sa.select(Event.seats_left).where(Event.event_id == event_id))
+            booked = self.db.session.scalar(
+                sa.select(sa.func.count()).where(Booking.event_id == event_id))
+        return {'seats': seats, 'bookings': booked,
+                'consistent': booked <= seats and seats_left == seats - booked}
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    path = seeding.use_temp_database('load-suite-')
+
+    from app import create_app, db
+
+    app = create_app()
+
+    with app.app_context():
+        started = time.perf_counter()
+        counts = seeding.seed(db, args.users, args.events, args.bookings,
+                              args.seats, args.seed)
+        seed_s = time.perf_counter() - started
+
+    scenarios = Scenarios(app, db, random.Random(args.seed), args.requests)
+    report = {'seed': dict(counts, seed=args.seed, elapsed_s=round(seed_s, 3),
+                           database=path),
+              'requests': args.requests, 'concurrency': args.concurrency, 'results': {}}
+    ok = True
+    for driver_cls in (ClientDriver, HTTPDriver):
+        if driver_cls.name not in args.drivers:
+            continue
+        driver = driver_cls(app)
+        results = report['results'][driver.name] = {}
+        try:
+            if args.warmup:
+                run(driver, scenarios.browse(args.warmup), args.concurrency)
+            for name in args.scenarios:
+                jobs = getattr(scenarios, name)(args.requests)
+                results[name] = run(driver, jobs, args.concurrency)
+                if name == 'book_storm':
+                    results[name].update(scenarios.check_storm())
+                    ok = ok and results[name]['consistent']
+        finally:
+            driver.close()
+    report['ok'] = ok
+    print(json.dumps(report, indent=2))
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""Outbound email burst.
+
+Queues a burst of password-reset emails through the outbox against the
+local SMTP sink and reports delivery time and how many SMTP connections
+the worker pool needed.
+
+    python -m benchmarks.mail_burst --emails 1000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--emails', type=int, default=500)
+    parser.add_argument('--timeout', type=float, default=60)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from benchmarks.smtp_sink import SMTPSink
+    sink = SMTPSink().start()
+
+    workdir = tempfile.mkdtemp(prefix='mail-burst-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'mail.db')
+    os.environ['MAIL_SERVER'] = sink.host
+    os.environ['MAIL_PORT'] = str(sink.port)
+
+    import sqlalchemy as sa
+    from app import create_app, db
+    app = create_app()
+    from app.models import User
+    from app.email import send_password_reset_email
+
+    app.config['SERVER_NAME'] = 'localhost'
+    with app.app_context():
+        db.create_all()
+        db.session.execute(sa.insert(User), [
+            {'username': f'mail{i}', 'email': f'mail{i}@example.com', 'role': 'user'}
+            for i in range(args.emails)])
+        db.session.commit()
+        users = db.session.scalars(sa.select(User)).all()
+
+        threads_before = threading.active_count()
+        started = time.perf_counter()
+        for user in users:
+            send_password_reset_email(user)
+        queued = time.perf_counter() - started
+        threads_during = threading.active_count() - threads_before
+
+    deadline = time.monotonic() + args.timeout
+    while len(sink.messages) < args.emails and time.monotonic() < deadline:
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - started
+
+    report = {
+        'emails': args.emails,
+        'delivered': len(sink.messages),
+        'smtp_connections': sink.connections,
+        'extra_threads': threads_during,
+        'enqueue_s': round(queued, 3),
+        'delivery_s': round(elapsed, 3),
+    }
+    print(json.dumps(report, indent=2))
+    sink.stop()
+    return 0 if report['delivered'] == args.emails else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
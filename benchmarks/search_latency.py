@@ -0,0 +1,92 @@
+"""Search latency benchmark.
+
+Seeds a throwaway SQLite database with a large event catalogue and times
+find_events() for a handful of queries, once through FTS5 and once through
+the in-process fallback index.
+
+    python -m benchmarks.search_latency --events 100000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta, time as dtime
+
+KEYWORDS = ('jazz rock opera ballet comedy lecture workshop festival marathon '
+         'hackathon cinema poetry chess yoga python design startup gallery '
+         'symphony theatre').split()
+QUERIES = ('jazz', 'jaz', 'rock festival', 'python workshop', 'sym', 'nothingmatches')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args(argv)
+
+
+def vocabulary(rng, size):
+    # Synthetic filler words so that, as in a real catalogue, each query
+    # term only matches a small slice of the events.
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return [''.join(rng.choices(letters, k=rng.randint(4, 9))) for _ in range(size)]
+
+
+def time_queries(find_events, repeat):
+    results = {}
+    for query in QUERIES:
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            found = find_events(query)
+            samples.append((time.perf_counter() - started) * 1000)
+        samples.sort()
+        results[query] = {'hits': len(found),
+                          'p50_ms': round(samples[len(samples) // 2], 3),
+                          'max_ms': round(samples[-1], 3)}
+    return results
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix='search-latency-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'search.db')
+
+    import sqlalchemy as sa
+    from app import create_app, db, search
+    app = create_app()
+    from app.models import Event
+
+    with app.app_context():
+        db.create_all()
+        filler = vocabulary(rng, 20000)
+        start = date.today()
+        db.session.execute(sa.insert(Event), [
+            {'title': f'{rng.choice(KEYWORDS).title()} {rng.choice(filler)} #{i}',
+             'description': ' '.join(rng.choices(filler, k=7) + [rng.choice(KEYWORDS)]),
+             'date': start + timedelta(days=i % 365), 'time': dtime(19, 0),
+             'location': 'Almaty', 'total_seats': 100, 'seats_left': 100,
+             'created_by': 'bench'}
+            for i in range(args.events)])
+        db.session.commit()
+
+        report = {'events': args.events}
+        report['fts5'] = time_queries(search.find_events, args.repeat)
+
+        search._fts_enabled[db.engine] = False
+        started = time.perf_counter()
+        search._fallback_index()
+        report['fallback_build_s'] = round(time.perf_counter() - started, 3)
+        report['fallback'] = time_queries(search.find_events, args.repeat)
+
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""Seeded throwaway databases for benchmarks.
+
+Fills a database with users, events and bookings using bulk inserts. The
+same --seed always produces the same data, so runs can be compared.
+
+    python -m benchmarks.seed --users 5000 --events 20000 --bookings 50000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+from datetime import date, timedelta, time as dtime
+
+from benchmarks.search_latency import KEYWORDS, vocabulary
+
+CHUNK = 5000
+PASSWORD = 'bench'
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def add_arguments(parser):
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--events', type=int, default=5000)
+    parser.add_argument('--bookings', type=int, default=20000)
+    parser.add_argument('--seats', type=int, default=200, help='seats per event')
+    parser.add_argument('--seed', type=int, default=1)
+
+
+def use_temp_database(prefix):
+    # Must run before the app package is imported.
+    workdir = tempfile.mkdtemp(prefix=prefix)
+    path = os.path.join(workdir, 'bench.db')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    return path
+
+
+def _insert(db, table, rows):
+    for start in range(0, len(rows), CHUNK):
+        db.session.execute(table.insert(), rows[start:start + CHUNK])
+
+
+def seed(db, users, events, bookings, seats=200, seed=1):
+    import sqlalchemy as sa
+    from werkzeug.security import generate_password_hash
+    from app.models import User, Event, Booking
+
+    rng = random.Random(seed)
+    filler = vocabulary(rng, 20000)
+    # One hash shared by every account; hashing per user would dominate seeding.
+    password_hash = generate_password_hash(PASSWORD)
+
+    db.create_all()
+    _insert(db, User.__table__, [
+        {'username': 'admin', 'email': 'admin@example.com',
+         'password_hash': password_hash, 'role': 'admin'}] + [
+        {'username': 'user{}'.format(i), 'email': 'user{}@example.com'.format(i),
+         'password_hash': password_hash, 'role': 'user'} for i in range(users)])
+
+    start = date.today()
+    _insert(db, Event.__table__, [
+        {'title': 'Event {}'.format(i),
+         'description': ' '.join([rng.choice(KEYWORDS)] + rng.sample(filler, 12)),
+         'date': start + timedelta(days=rng.randrange(365)),
+         'time': dtime(rng.randrange(9, 23), rng.choice((0, 30))),
+         'location': rng.choice(('Almaty', 'Astana', 'Shymkent', 'Karaganda')),
+         'total_seats': seats, 'seats_left': seats, 'created_by': 'admin'}
+        for i in range(events)])
+
+    user_ids = db.session.scalars(sa.select(User.id).where(User.role == 'user')).all()
+    event_ids = db.session.scalars(sa.select(Event.event_id)).all()
+    pairs = set()
+    limit = min(bookings, len(user_ids) * len(event_ids), len(event_ids) * seats)
+    taken = dict.fromkeys(event_ids, 0)
+    while len(pairs) < limit:
+        event_id = rng.choice(event_ids)
+        if taken[event_id] >= seats:
+            continue
+        pair = (rng.choice(user_ids), event_id)
+        if pair not in pairs:
+            pairs.add(pair)
+            taken[event_id] += 1
+    _insert(db, Booking.__table__,
+            [{'user_id': user_id, 'event_id': event_id} for user_id, event_id in pairs])
+    db.session.execute(
+        sa.update(Event).values(seats_left=Event.total_seats - sa.select(sa.func.count())
+                                .where(Booking.event_id == Event.event_id)
+                                .scalar_subquery()))
+    db.session.commit()
+    return {'users': len(user_ids), 'events': len(event_ids), 'bookings': len(pairs)}
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    path = use_temp_database('seed-')
+
+    from app import create_app, db
+
+    app = create_app()
+
+    with app.app_context():
+        counts = seed(db, args.users, args.events, args.bookings, args.seats, args.seed)
+    print(json.dumps(dict(counts, database=path), indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Local SMTP stand-in.
+
+A minimal threaded SMTP server that accepts every message and keeps it in
+memory, for exercising the outbox without a real mail server. It also
+counts connections so batching can be checked, and can refuse chosen
+recipients to exercise per-message failures.
+
+    python -m benchmarks.smtp_sink --port 8025
+"""
+import argparse
+import socketserver
+import threading
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + '\r\n').encode())
+
+    def handle(self):
+        sink = self.server.sink
+        with sink.lock:
+            sink.connections += 1
+        self.reply('220 smtp-sink ready')
+        envelope = {'from': None, 'to': []}
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip()
+            verb = command[:4].upper()
+            if verb == 'EHLO':
+                self.reply('250-smtp-sink')
+                self.reply('250 8BITMIME')
+            elif verb == 'HELO':
+                self.reply('250 smtp-sink')
+            elif verb == 'MAIL':
+                envelope = {'from': command.split(':', 1)[1].strip(), 'to': []}
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipient = command.split(':', 1)[1].strip()
+                if recipient.strip('<>') in sink.reject:
+                    self.reply('550 No such user')
+                    continue
+                envelope['to'].append(recipient)
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for raw in self.rfile:
+                    if raw in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(raw[1:] if raw.startswith(b'..') else raw)
+                with sink.lock:
+                    sink.messages.append(dict(envelope, data=b''.join(data)))
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    def __init__(self, host='127.0.0.1', port=0, reject=()):
+        self.lock = threading.Lock()
+        self.reject = frozenset(reject)
+        self.messages = []
+        self.connections = 0
+        self._server = _Server((host, port), _Handler)
+        self._server.sink = self
+        self.host, self.port = self._server.server_address
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8025)
+    args = parser.parse_args(argv)
+    sink = SMTPSink(args.host, args.port)
+    print('Listening on {}:{}'.format(sink.host, sink.port))
+    try:
+        sink._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,17 @@
+def percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return None
+    index = min(len(sorted_samples) - 1, int(round(pct / 100 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def summarize(samples_ms, elapsed_s):
+    samples = sorted(samples_ms)
+    return {
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / elapsed_s, 1) if elapsed_s else None,
+        'p50_ms': round(percentile(samples, 50), 3) if samples else None,
+        'p95_ms': round(percentile(samples, 95), 3) if samples else None,
+        'p99_ms': round(percentile(samples, 99), 3) if samples else None,
+        'max_ms': round(samples[-1], 3) if samples else None,
+    }
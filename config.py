@@ -6,10 +6,93 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE') or 1800),
+        'pool_pre_ping': True,
+    }
+    if os.environ.get('DB_POOL_SIZE'):
+        SQLALCHEMY_ENGINE_OPTIONS['pool_size'] = int(os.environ['DB_POOL_SIZE'])
+        SQLALCHEMY_ENGINE_OPTIONS['max_overflow'] = int(os.environ.get('DB_MAX_OVERFLOW') or 10)
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE') or 'wal'
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5000)
+    REPLICA_DATABASE_URL = os.environ.get('REPLICA_DATABASE_URL')
+    SQLALCHEMY_BINDS = {'replica': REPLICA_DATABASE_URL} if REPLICA_DATABASE_URL else {}
+    REPLICA_READ_AFTER_WRITE = int(os.environ.get('REPLICA_READ_AFTER_WRITE') or 10)
     SECRET_KEY = 'supersecret'
     MAIL_SERVER = os.environ.get('MAIL_SERVER')
     MAIL_PORT = int(os.environ.get('MAIL_PORT') or 25)
     MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS') is not None
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
-    ADMINS = ['your-email@example.com']
\ No newline at end of file
+    ADMINS = ['your-email@example.com']
+    EVENTS_PER_PAGE = int(os.environ.get('EVENTS_PER_PAGE') or 24)
+    SEARCH_RESULT_LIMIT = int(os.environ.get('SEARCH_RESULT_LIMIT') or 50)
+    ADMIN_BOOKINGS_PER_PAGE = int(os.environ.get('ADMIN_BOOKINGS_PER_PAGE') or 50)
+    EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE') or 1000)
+    MAIL_WORKERS = int(os.environ.get('MAIL_WORKERS') or 2)
+    MAIL_BATCH_SIZE = int(os.environ.get('MAIL_BATCH_SIZE') or 50)
+    MAIL_POLL_INTERVAL = 5
+    MAIL_LEASE_TIMEOUT = 300
+    MAIL_MAX_ATTEMPTS = 5
+    MAIL_RETRY_BACKOFF = 30
+    MAIL_RETRY_BACKOFF_MAX = 3600
+    REMINDER_WINDOW_HOURS = int(os.environ.get('REMINDER_WINDOW_HOURS') or 24)
+    REMINDER_BATCH_SIZE = int(os.environ.get('REMINDER_BATCH_SIZE') or 500)
+    REMINDER_WORKERS = int(os.environ.get('REMINDER_WORKERS') or 1)
+    REMINDER_POLL_INTERVAL = int(os.environ.get('REMINDER_POLL_INTERVAL') or 300)
+    LIVE_COALESCE_INTERVAL = float(os.environ.get('LIVE_COALESCE_INTERVAL') or 1.0)
+    LIVE_HEARTBEAT_INTERVAL = int(os.environ.get('LIVE_HEARTBEAT_INTERVAL') or 15)
+    LIVE_MAX_CONNECTIONS = int(os.environ.get('LIVE_MAX_CONNECTIONS') or 5000)
+    LIVE_MAX_CONNECTIONS_PER_CLIENT = int(os.environ.get('LIVE_MAX_CONNECTIONS_PER_CLIENT') or 4)
+    LIVE_RETRY_AFTER = 5
+    IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL') or 86400)
+    IDEMPOTENCY_SWEEP_INTERVAL = 300
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND') or 'app.cache.MemoryCache'
+    CACHE_TTL = int(os.environ.get('CACHE_TTL') or 30)
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES') or 10000)
+    FRAGMENT_CACHE_TTL = int(os.environ.get('FRAGMENT_CACHE_TTL') or 3600)
+    JINJA_CACHE_DIR = os.environ.get('JINJA_CACHE_DIR') or os.path.join(basedir, '.jinja_cache')
+    # A single worker keeps admissions strictly FIFO.
+    ADMISSION_WORKERS = int(os.environ.get('ADMISSION_WORKERS') or 1)
+    ADMISSION_BATCH_SIZE = int(os.environ.get('ADMISSION_BATCH_SIZE') or 200)
+    ADMISSION_POLL_INTERVAL = 1
+    # Immediate re-runs of a batch that lost a race before waiting for the poll.
+    ADMISSION_RETRIES = 3
+    # Daily booking totals are rolled up from event_stats off the booking path.
+    STATS_ROLLUP_WORKERS = int(os.environ.get('STATS_ROLLUP_WORKERS') or 1)
+    STATS_ROLLUP_INTERVAL = int(os.environ.get('STATS_ROLLUP_INTERVAL') or 60)
+    STATS_ROLLUP_BATCH_SIZE = int(os.environ.get('STATS_ROLLUP_BATCH_SIZE') or 1000)
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE') or 1000)
+    API_CACHE_MAX_AGE = int(os.environ.get('API_CACHE_MAX_AGE') or 5)
+    API_MAX_PAGE_SIZE = 100
+    MAX_SEATS_PER_BOOKING = int(os.environ.get('MAX_SEATS_PER_BOOKING') or 10)
+    MAX_EVENTS_PER_BATCH = 20
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.join(basedir, 'app', 'static', 'uploads')
+    MAX_CONTENT_LENGTH = 2 * 1024 * 1024  # 2 MB max size
+    THUMBNAIL_SIZE = int(os.environ.get('THUMBNAIL_SIZE') or 480)
+    THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS') or 2)
+    MEDIA_MAX_AGE = 365 * 24 * 3600
+    ASSET_MAX_AGE = 365 * 24 * 3600
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS') or 100)
+    SLOW_QUERY_LOG_SIZE = 100
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    METRICS_DEBUG_HEADER = os.environ.get('METRICS_DEBUG_HEADER') is not None
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', '1') != '0'
+    # Number of reverse proxies in front of the app whose X-Forwarded-*
+    # headers are trusted; 0 uses the socket peer address.
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR') or 0)
+    RATELIMIT_STORAGE = os.environ.get('RATELIMIT_STORAGE') or 'app.ratelimit.MemoryStorage'
+    RATELIMIT_BUCKETS = 10
+    RATELIMIT_SWEEP_INTERVAL = 60
+    # (requests, seconds) per sliding window
+    RATELIMIT_LOGIN_PER_IP = (20, 300)
+    RATELIMIT_LOGIN_PER_ACCOUNT = (5, 300)
+    RATELIMIT_REGISTER_PER_IP = (5, 3600)
+    RATELIMIT_RESET_PER_IP = (5, 3600)
+    RATELIMIT_RESET_PER_ACCOUNT = (3, 3600)
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL') or 60)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'scrypt:32768:8:1'
+    ANALYTICS_DAYS = 30
+    ANALYTICS_TOP_EVENTS = 10
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS') or 1)
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE') or 500)
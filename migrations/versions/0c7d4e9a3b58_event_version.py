@@ -0,0 +1,26 @@
+"""event version
+
+Revision ID: 0c7d4e9a3b58
+Revises: e83b5a7c0f24
+Create Date: 2026-10-18 17:40:12.665031
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0c7d4e9a3b58'
+down_revision = 'e83b5a7c0f24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # plain ADD COLUMN: rebuilding the event table would drop the FTS triggers
+    op.add_column('event', sa.Column('version', sa.Integer(), nullable=False,
+                                     server_default='1'))
+
+
+def downgrade():
+    op.drop_column('event', 'version')
@@ -0,0 +1,40 @@
+"""archive event stats and images
+
+Revision ID: 2c8f5a1e9d47
+Revises: 6e2a9c4f1b83
+Create Date: 2026-10-19 09:41:26.104382
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c8f5a1e9d47'
+down_revision = '6e2a9c4f1b83'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('event_archive', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image', sa.String(length=80), nullable=True))
+        batch_op.add_column(sa.Column('thumbnail', sa.String(length=96), nullable=True))
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+        batch_op.add_column(sa.Column('bookings', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('cancellations', sa.Integer(), server_default='0', nullable=False))
+
+    # Events archived before this revision lost their stats row; their
+    # archived bookings are the best count left. Cancellations are gone.
+    op.execute('UPDATE event_archive SET bookings = ('
+               'SELECT COALESCE(SUM(booking_archive.seats), 0) FROM booking_archive '
+               'WHERE booking_archive.event_id = event_archive.event_id)')
+
+
+def downgrade():
+    with op.batch_alter_table('event_archive', schema=None) as batch_op:
+        batch_op.drop_column('cancellations')
+        batch_op.drop_column('bookings')
+        batch_op.drop_column('version')
+        batch_op.drop_column('thumbnail')
+        batch_op.drop_column('image')
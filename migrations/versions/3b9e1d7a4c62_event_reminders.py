@@ -0,0 +1,33 @@
+"""event reminders
+
+Revision ID: 3b9e1d7a4c62
+Revises: 8a5c2f7e1d39
+Create Date: 2026-10-19 00:31:42.718204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9e1d7a4c62'
+down_revision = '8a5c2f7e1d39'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reminded_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_booking_event_id_booking_id', ['event_id', 'booking_id'], unique=False)
+
+    # plain add_column: a batch rebuild of `event` would drop the FTS triggers
+    op.add_column('event', sa.Column('reminder_sent_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('event', 'reminder_sent_at')
+
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.drop_index('ix_booking_event_id_booking_id')
+        batch_op.drop_column('reminded_at')
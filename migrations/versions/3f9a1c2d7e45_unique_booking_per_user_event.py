@@ -0,0 +1,36 @@
+"""unique booking per user and event
+
+Revision ID: 3f9a1c2d7e45
+Revises: b810c538a9d1
+Create Date: 2026-10-18 10:12:41.502113
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a1c2d7e45'
+down_revision = 'b810c538a9d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 1) drop duplicate bookings left behind by the old read-modify-write path
+    op.execute(
+        "DELETE FROM booking WHERE booking_id NOT IN "
+        "(SELECT MIN(booking_id) FROM booking GROUP BY user_id, event_id)")
+
+    # 2) reconcile seats_left with the bookings that remain
+    op.execute(
+        "UPDATE event SET seats_left = total_seats - "
+        "(SELECT COUNT(*) FROM booking WHERE booking.event_id = event.event_id)")
+    op.execute("UPDATE event SET seats_left = 0 WHERE seats_left < 0")
+
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_booking_user_event', ['user_id', 'event_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_booking_user_event', type_='unique')
@@ -0,0 +1,38 @@
+"""booking seat quantity
+
+Revision ID: 4d1f8c6b2e73
+Revises: 9e4b7a2c5d16
+Create Date: 2026-10-18 22:31:08.640152
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d1f8c6b2e73'
+down_revision = '9e4b7a2c5d16'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('admission_request', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('seats', sa.Integer(), server_default='1', nullable=False))
+
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('seats', sa.Integer(), server_default='1', nullable=False))
+
+    with op.batch_alter_table('booking_archive', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('seats', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('booking_archive', schema=None) as batch_op:
+        batch_op.drop_column('seats')
+
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.drop_column('seats')
+
+    with op.batch_alter_table('admission_request', schema=None) as batch_op:
+        batch_op.drop_column('seats')
@@ -0,0 +1,45 @@
+"""outbound email queue
+
+Revision ID: 5b8d3e1f6c92
+Revises: d41e6f0b2a87
+Create Date: 2026-10-18 13:48:09.264417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8d3e1f6c92'
+down_revision = 'd41e6f0b2a87'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('outbound_email',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('subject', sa.String(length=256), nullable=False),
+    sa.Column('sender', sa.String(length=128), nullable=False),
+    sa.Column('recipients', sa.JSON(), nullable=False),
+    sa.Column('text_body', sa.Text(), nullable=False),
+    sa.Column('html_body', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('claim_token', sa.String(length=32), nullable=True),
+    sa.Column('claimed_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.String(length=256), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('outbound_email', schema=None) as batch_op:
+        batch_op.create_index('ix_outbound_email_status_next_attempt_at', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('outbound_email', schema=None) as batch_op:
+        batch_op.drop_index('ix_outbound_email_status_next_attempt_at')
+
+    op.drop_table('outbound_email')
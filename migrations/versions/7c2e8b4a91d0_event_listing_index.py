@@ -0,0 +1,25 @@
+"""event listing index
+
+Revision ID: 7c2e8b4a91d0
+Revises: 3f9a1c2d7e45
+Create Date: 2026-10-18 11:03:27.118904
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e8b4a91d0'
+down_revision = '3f9a1c2d7e45'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('event', schema=None) as batch_op:
+        batch_op.create_index('ix_event_date_time_event_id', ['date', 'time', 'event_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('event', schema=None) as batch_op:
+        batch_op.drop_index('ix_event_date_time_event_id')
@@ -0,0 +1,27 @@
+"""pending event stats
+
+Revision ID: 7d3b5e9a2f61
+Revises: 2c8f5a1e9d47
+Create Date: 2026-10-20 11:02:37.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d3b5e9a2f61'
+down_revision = '2c8f5a1e9d47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('event_stats', sa.Column('pending_bookings', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('event_stats', sa.Column('pending_cancellations', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('event_stats', schema=None) as batch_op:
+        batch_op.drop_column('pending_cancellations')
+        batch_op.drop_column('pending_bookings')
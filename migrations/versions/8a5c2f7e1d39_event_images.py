@@ -0,0 +1,27 @@
+"""event images
+
+Revision ID: 8a5c2f7e1d39
+Revises: 4d1f8c6b2e73
+Create Date: 2026-10-18 23:47:15.205816
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a5c2f7e1d39'
+down_revision = '4d1f8c6b2e73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # plain add_column: a batch rebuild of `event` would drop the FTS triggers
+    op.add_column('event', sa.Column('image', sa.String(length=80), nullable=True))
+    op.add_column('event', sa.Column('thumbnail', sa.String(length=96), nullable=True))
+
+
+def downgrade():
+    op.drop_column('event', 'thumbnail')
+    op.drop_column('event', 'image')
@@ -0,0 +1,69 @@
+"""event range indexes and archive tables
+
+Revision ID: 9e4b7a2c5d16
+Revises: f2a8d6c41b97
+Create Date: 2026-10-18 21:04:52.913340
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4b7a2c5d16'
+down_revision = 'f2a8d6c41b97'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('booking_archive',
+    sa.Column('booking_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('booked_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('booking_id')
+    )
+    with op.batch_alter_table('booking_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_booking_archive_event_id'), ['event_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_booking_archive_user_id'), ['user_id'], unique=False)
+
+    op.create_table('event_archive',
+    sa.Column('event_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('title', sa.String(length=128), nullable=False),
+    sa.Column('description', sa.String(length=256), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('time', sa.Time(), nullable=False),
+    sa.Column('location', sa.String(length=30), nullable=False),
+    sa.Column('total_seats', sa.Integer(), nullable=False),
+    sa.Column('seats_left', sa.Integer(), nullable=False),
+    sa.Column('created_by', sa.String(length=64), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('event_id')
+    )
+    with op.batch_alter_table('event_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_event_archive_date'), ['date'], unique=False)
+
+    # plain create_index: a batch rebuild of `event` would drop the FTS triggers
+    op.create_index('ix_event_location_date_time_event_id', 'event',
+                    ['location', 'date', 'time', 'event_id'], unique=False)
+    op.create_index('ix_event_available_date_time_event_id', 'event',
+                    ['date', 'time', 'event_id'], unique=False,
+                    sqlite_where=sa.text('seats_left > 0'),
+                    postgresql_where=sa.text('seats_left > 0'))
+
+
+def downgrade():
+    op.drop_index('ix_event_available_date_time_event_id', table_name='event')
+    op.drop_index('ix_event_location_date_time_event_id', table_name='event')
+
+    with op.batch_alter_table('event_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_event_archive_date'))
+
+    op.drop_table('event_archive')
+    with op.batch_alter_table('booking_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_booking_archive_user_id'))
+        batch_op.drop_index(batch_op.f('ix_booking_archive_event_id'))
+
+    op.drop_table('booking_archive')
@@ -0,0 +1,27 @@
+"""booking lookup indexes
+
+Revision ID: a6f2c9d84b13
+Revises: 5b8d3e1f6c92
+Create Date: 2026-10-18 15:02:44.910376
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6f2c9d84b13'
+down_revision = '5b8d3e1f6c92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # (user_id, event_id) lookups are already served by uq_booking_user_event;
+    # this covers the event side (attendee lists, cascades on event delete).
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.create_index('ix_booking_event_id_user_id', ['event_id', 'user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.drop_index('ix_booking_event_id_user_id')
@@ -0,0 +1,57 @@
+"""event full text search
+
+Revision ID: d41e6f0b2a87
+Revises: 7c2e8b4a91d0
+Create Date: 2026-10-18 12:26:55.730218
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41e6f0b2a87'
+down_revision = '7c2e8b4a91d0'
+branch_labels = None
+depends_on = None
+
+
+def _fts5_available(bind):
+    return bind.dialect.name == 'sqlite' and bool(bind.exec_driver_sql(
+        "SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar())
+
+
+def upgrade():
+    # other databases fall back to the in-process index in app/search.py
+    if not _fts5_available(op.get_bind()):
+        return
+
+    op.execute(
+        "CREATE VIRTUAL TABLE event_fts USING fts5("
+        "title, description, content='event', content_rowid='event_id')")
+    op.execute(
+        "CREATE TRIGGER event_fts_ai AFTER INSERT ON event BEGIN "
+        "INSERT INTO event_fts(rowid, title, description) "
+        "VALUES (new.event_id, new.title, new.description); END")
+    op.execute(
+        "CREATE TRIGGER event_fts_ad AFTER DELETE ON event BEGIN "
+        "INSERT INTO event_fts(event_fts, rowid, title, description) "
+        "VALUES ('delete', old.event_id, old.title, old.description); END")
+    op.execute(
+        "CREATE TRIGGER event_fts_au AFTER UPDATE OF title, description ON event BEGIN "
+        "INSERT INTO event_fts(event_fts, rowid, title, description) "
+        "VALUES ('delete', old.event_id, old.title, old.description); "
+        "INSERT INTO event_fts(rowid, title, description) "
+        "VALUES (new.event_id, new.title, new.description); END")
+
+    # index the events that already exist
+    op.execute("INSERT INTO event_fts(event_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("DROP TRIGGER IF EXISTS event_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS event_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS event_fts_ai")
+    op.execute("DROP TABLE IF EXISTS event_fts")
@@ -0,0 +1,50 @@
+"""on-sale admission queue
+
+Revision ID: e83b5a7c0f24
+Revises: a6f2c9d84b13
+Create Date: 2026-10-18 16:21:37.482650
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e83b5a7c0f24'
+down_revision = 'a6f2c9d84b13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # plain ADD COLUMN: rebuilding the event table would drop the FTS triggers
+    op.add_column('event', sa.Column('on_sale_queue', sa.Boolean(), nullable=False,
+                                     server_default=sa.false()))
+
+    op.create_table('admission_request',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('token', sa.String(length=32), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['event_id'], ['event.event_id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('admission_request', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_admission_request_token'), ['token'], unique=True)
+        batch_op.create_index('ix_admission_request_status_id', ['status', 'id'], unique=False)
+        batch_op.create_index('ix_admission_request_event_id_status_id', ['event_id', 'status', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('admission_request', schema=None) as batch_op:
+        batch_op.drop_index('ix_admission_request_event_id_status_id')
+        batch_op.drop_index('ix_admission_request_status_id')
+        batch_op.drop_index(batch_op.f('ix_admission_request_token'))
+
+    op.drop_table('admission_request')
+
+    op.drop_column('event', 'on_sale_queue')
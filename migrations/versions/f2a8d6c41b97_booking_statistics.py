@@ -0,0 +1,49 @@
+"""booking statistics
+
+Revision ID: f2a8d6c41b97
+Revises: 0c7d4e9a3b58
+Create Date: 2026-10-18 19:12:37.508214
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a8d6c41b97'
+down_revision = '0c7d4e9a3b58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('booking_stats_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('bookings', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('cancellations', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+    op.create_table('event_stats',
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('bookings', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('cancellations', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['event_id'], ['event.event_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('event_id')
+    )
+
+    # backfill from the bookings that already exist
+    op.execute(
+        'INSERT INTO event_stats (event_id, bookings, cancellations, updated_at) '
+        'SELECT booking.event_id, count(booking.booking_id), 0, CURRENT_TIMESTAMP '
+        'FROM booking JOIN event ON event.event_id = booking.event_id '
+        'GROUP BY booking.event_id')
+    op.execute(
+        'INSERT INTO booking_stats_daily (day, bookings, cancellations) '
+        'SELECT date(booked_at), count(booking_id), 0 FROM booking '
+        'WHERE booked_at IS NOT NULL GROUP BY date(booked_at)')
+
+
+def downgrade():
+    op.drop_table('event_stats')
+    op.drop_table('booking_stats_daily')
@@ -0,0 +1,58 @@
+from datetime import date, time, timedelta
+
+import pytest
+import sqlalchemy as sa
+
+from app import create_app, db
+from app.models import User, Event
+from config import Config
+
+
+@pytest.fixture
+def config(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'test.db')
+        WTF_CSRF_ENABLED = False
+        JINJA_CACHE_DIR = None
+        MAIL_SERVER = None
+        # Background queues are driven by the tests themselves.
+        MAIL_WORKERS = 0
+        ADMISSION_WORKERS = 0
+        REMINDER_WORKERS = 0
+        STATS_ROLLUP_WORKERS = 0
+        PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    return TestConfig
+
+
+@pytest.fixture
+def app(config):
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def make_user(app):
+    def make_user(username, password='secret', role='user'):
+        user = User(username=username, email='{}@example.com'.format(username), role=role)
+        user.set_password(password)
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+    return make_user
+
+
+@pytest.fixture
+def make_event(app):
+    def make_event(title, seats=10):
+        event_id = db.session.execute(sa.insert(Event).values(
+            title=title, description=title, date=date.today() + timedelta(days=7),
+            time=time(20, 0), location='Hall', total_seats=seats, seats_left=seats,
+            created_by='admin')).inserted_primary_key[0]
+        db.session.commit()
+        return event_id
+    return make_event
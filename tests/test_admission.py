@@ -0,0 +1,27 @@
+import sqlalchemy as sa
+
+from app import db
+from app.admission import admission, _SeatsChanged
+from app.models import Event, Booking
+
+
+def test_batch_that_loses_a_race_is_retried_at_once(app, make_user, make_event, monkeypatch):
+    event_id = make_event('On sale', seats=2)
+    for name in ('alice', 'bob', 'carol'):
+        admission.enqueue(make_user(name), event_id)
+
+    admit = admission._admit
+    calls = []
+
+    def changed_once(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise _SeatsChanged()
+        return admit(*args)
+
+    monkeypatch.setattr(admission, '_admit', changed_once)
+
+    assert admission.process_batch() == 3
+    assert len(calls) == 2
+    assert db.session.scalar(sa.select(sa.func.count(Booking.booking_id))) == 2
+    assert db.session.scalar(sa.select(Event.seats_left).where(Event.event_id == event_id)) == 0
@@ -0,0 +1,16 @@
+from app import create_app
+from app.cache import cache
+from app.ratelimit import limiter
+
+
+def test_apps_in_one_process_keep_their_own_state(app, config):
+    other = create_app(config)
+
+    cache.invalidate_event(1)
+    limiter.storage.hit('login:ip:10.0.0.1', 1, 60)
+    with other.app_context():
+        assert cache.stats()['invalidations'] == 0
+        assert limiter.storage.peek('login:ip:10.0.0.1', 1, 60) == 0
+        assert other.extensions['workers']['outbox'] is not app.extensions['workers']['outbox']
+    assert cache.stats()['invalidations'] == 1
+    assert limiter.storage.peek('login:ip:10.0.0.1', 1, 60) > 0
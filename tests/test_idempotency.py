@@ -0,0 +1,87 @@
+import pytest
+import sqlalchemy as sa
+from flask_login import login_user
+
+from app import db
+from app.idempotency import idempotent
+from app.models import Event, Booking, IdempotencyKey, User
+from app.reservations import reserve_seat, ReservationOutcome
+
+
+@pytest.fixture
+def client(app, make_user):
+    make_user('alice')
+    client = app.test_client()
+    client.post('/login', data={'username': 'alice', 'password': 'secret'})
+    return client
+
+
+def book(client, event_id, key, seats=1):
+    return client.post('/api/v1/events/{}/booking'.format(event_id), json={'seats': seats},
+                       headers={'Idempotency-Key': key})
+
+
+def seats_left(event_id):
+    return db.session.scalar(sa.select(Event.seats_left).where(Event.event_id == event_id))
+
+
+def bookings():
+    return db.session.scalar(sa.select(sa.func.count(Booking.booking_id)))
+
+
+def test_retry_replays_the_original_outcome(client, make_event):
+    event_id = make_event('Concert', seats=5)
+
+    first = book(client, event_id, 'k-1', seats=2)
+    retry = book(client, event_id, 'k-1', seats=2)
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.get_json() == first.get_json() == {'status': 'booked', 'seats': 2}
+    assert seats_left(event_id) == 3
+    assert bookings() == 1
+    # A new key is a new request.
+    assert book(client, event_id, 'k-2').get_json()['status'] == 'already_booked'
+
+
+def test_key_reused_for_another_request_is_rejected(client, make_event):
+    event_id = make_event('Concert', seats=5)
+    other_id = make_event('Play', seats=5)
+    book(client, event_id, 'k-1')
+
+    assert book(client, other_id, 'k-1').status_code == 422
+    cancel = client.delete('/api/v1/events/{}/booking'.format(event_id),
+                           headers={'Idempotency-Key': 'k-1'})
+    assert cancel.status_code == 422
+    assert 'error' in cancel.get_json()
+    assert seats_left(event_id) == 4
+    assert seats_left(other_id) == 5
+    assert bookings() == 1
+
+
+def test_key_and_booking_commit_or_roll_back_together(app, make_user, make_event):
+    event_id = make_event('Concert', seats=5)
+    user_id = make_user('alice')
+    # Another request with the same key won the race and stored its outcome.
+    db.session.add(IdempotencyKey(user_id=user_id, key='k-1', action='book',
+                                  event_id=event_id, outcome='booked'))
+    db.session.commit()
+
+    with app.test_request_context(headers={'Idempotency-Key': 'k-1'}):
+        login_user(db.session.get(User, user_id))
+        outcome = idempotent('book', event_id, lambda record: reserve_seat(
+            user_id, event_id, 2, record))
+
+    # The key's insert failed, taking this request's booking down with it.
+    assert outcome is ReservationOutcome.BOOKED
+    assert seats_left(event_id) == 5
+    assert bookings() == 0
+
+    with app.test_request_context(headers={'Idempotency-Key': 'k-2'}):
+        login_user(db.session.get(User, user_id))
+        outcome = idempotent('book', event_id, lambda record: reserve_seat(
+            user_id, event_id, 2, record))
+
+    assert outcome is ReservationOutcome.BOOKED
+    assert seats_left(event_id) == 3
+    assert db.session.scalar(sa.select(IdempotencyKey.outcome).where(
+        IdempotencyKey.key == 'k-2')) == 'booked'
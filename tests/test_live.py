@@ -0,0 +1,23 @@
+import json
+
+from app.live import live
+from app.reservations import reserve_seat
+
+
+def test_push_before_the_first_read_is_delivered(app, make_user, make_event):
+    app.config['LIVE_HEARTBEAT_INTERVAL'] = 1
+    event_id = make_event('Concert', seats=5)
+    channel, seen, unsubscribe = live.subscribe(event_id, '10.0.0.1')
+    stream = live.stream(channel, seen, {'seats_left': 5, 'total_seats': 5, 'version': 1})
+
+    # Booked and pushed while the response is still on its way out.
+    reserve_seat(make_user('alice'), event_id, seats=2)
+    live.flush({event_id})
+
+    assert next(stream).startswith('retry:')
+    assert json.loads(next(stream).split('data: ')[1])['seats_left'] == 5
+    message = next(stream)
+    assert message.startswith('id: ')
+    assert json.loads(message.split('data: ')[1])['seats_left'] == 3
+    unsubscribe()
+    assert live.stats()['connections'] == 0
@@ -0,0 +1,42 @@
+import pytest
+import sqlalchemy as sa
+
+from app import db
+from app.email import outbox
+from app.models import OutboundEmail
+from benchmarks.smtp_sink import SMTPSink
+
+
+@pytest.fixture
+def sink():
+    return SMTPSink(reject={'bad@example.com'}).start()
+
+
+@pytest.fixture
+def config(config, sink):
+    class OutboxConfig(config):
+        MAIL_SERVER = sink.host
+        MAIL_PORT = sink.port
+        MAIL_SUPPRESS_SEND = False
+    return OutboxConfig
+
+
+def test_refused_recipient_only_reschedules_its_own_message(app, sink):
+    for recipient in ('first@example.com', 'bad@example.com', 'last@example.com'):
+        db.session.add(OutboundEmail(subject='Hi', sender='ebs@example.com',
+                                     recipients=[recipient], text_body='Hello'))
+    db.session.commit()
+
+    assert outbox.process_batch() == 2
+
+    emails = {email.recipients[0]: email for email in
+              db.session.scalars(sa.select(OutboundEmail))}
+    assert emails['first@example.com'].status == 'sent'
+    assert emails['last@example.com'].status == 'sent'
+    assert emails['last@example.com'].attempts == 0
+    assert emails['last@example.com'].last_error is None
+    assert emails['bad@example.com'].status == 'pending'
+    assert emails['bad@example.com'].attempts == 1
+    assert '550' in emails['bad@example.com'].last_error
+    assert sorted(message['to'][0] for message in sink.messages) == [
+        '<first@example.com>', '<last@example.com>']
@@ -0,0 +1,62 @@
+import pytest
+from flask import abort
+
+from app.ratelimit import MemoryStorage, client_address
+
+
+@pytest.fixture
+def config(config):
+    class RateLimitConfig(config):
+        PROXY_FIX_X_FOR = 1
+    return RateLimitConfig
+
+
+def test_memory_storage_counts_a_sliding_window():
+    storage = MemoryStorage({'RATELIMIT_BUCKETS': 10, 'RATELIMIT_SWEEP_INTERVAL': 600})
+
+    for _ in range(3):
+        assert storage.hit('login:ip:10.0.0.1', 3, 60, now=0) == 0
+    assert storage.peek('login:ip:10.0.0.1', 3, 60, now=0) == 60
+    assert storage.hit('login:ip:10.0.0.1', 3, 60, now=30) == 30
+    assert storage.peek('login:ip:10.0.0.2', 3, 60, now=30) == 0
+    # The first hits have left the window.
+    assert storage.hit('login:ip:10.0.0.1', 3, 60, now=60) == 0
+
+
+def test_client_address_trusts_one_proxy(app):
+    app.add_url_rule('/whoami', 'whoami', client_address)
+    client = app.test_client()
+
+    response = client.get('/whoami', headers={'X-Forwarded-For': '203.0.113.9, 10.0.0.5'},
+                          environ_base={'REMOTE_ADDR': '10.0.0.1'})
+    assert response.text == '10.0.0.5'
+    assert client.get('/whoami', environ_base={'REMOTE_ADDR': '10.0.0.1'}).text == '10.0.0.1'
+
+
+def test_only_failed_logins_lock_an_account(app, make_user):
+    make_user('alice', password='secret')
+    client = app.test_client()
+
+    def login(password):
+        response = client.post('/login', data={'username': 'alice', 'password': password})
+        client.get('/logout')
+        return response
+
+    for _ in range(6):
+        assert login('secret').location == '/index'
+    for _ in range(4):
+        assert login('wrong').location == '/login'
+    assert login('secret').location == '/index'
+
+    assert login('wrong').location == '/login'
+    response = login('secret')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+
+
+def test_retry_after_is_only_sent_when_known(app):
+    app.add_url_rule('/busy', 'busy', lambda: abort(429))
+
+    response = app.test_client().get('/busy')
+    assert response.status_code == 429
+    assert 'Retry-After' not in response.headers
@@ -0,0 +1,118 @@
+import threading
+
+import sqlalchemy as sa
+
+from app import db
+from app.cache import cache
+from app.models import Event, Booking
+from app.pagination import EventFilters
+from app.reservations import reserve_seat, reserve_seats, release_seat, ReservationOutcome
+
+
+def seats_left(event_id):
+    return db.session.scalar(sa.select(Event.seats_left).where(Event.event_id == event_id))
+
+
+def bookings(event_id):
+    return db.session.scalar(
+        sa.select(sa.func.count(Booking.booking_id)).where(Booking.event_id == event_id))
+
+
+def test_concurrent_bookers_never_oversell(app, make_user, make_event):
+    event_id = make_event('Small room', seats=3)
+    user_ids = [make_user('user{}'.format(i)) for i in range(12)]
+    barrier = threading.Barrier(len(user_ids))
+    outcomes = []
+
+    def book(user_id):
+        with app.app_context():
+            barrier.wait()
+            outcomes.append(reserve_seat(user_id, event_id))
+
+    threads = [threading.Thread(target=book, args=(user_id,)) for user_id in user_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert outcomes.count(ReservationOutcome.BOOKED) == 3
+    assert outcomes.count(ReservationOutcome.SOLD_OUT) == 9
+    assert seats_left(event_id) == 0
+    assert bookings(event_id) == 3
+
+
+def test_group_that_does_not_fit_is_refused(app, make_user, make_event):
+    event_id = make_event('Nearly full', seats=3)
+
+    assert reserve_seat(make_user('alice'), event_id, seats=4) is ReservationOutcome.SOLD_OUT
+    assert seats_left(event_id) == 3
+    assert bookings(event_id) == 0
+
+
+def test_second_booking_by_the_same_user_is_refused(app, make_user, make_event):
+    event_id = make_event('Concert', seats=5)
+    user_id = make_user('alice')
+
+    assert reserve_seat(user_id, event_id, seats=2) is ReservationOutcome.BOOKED
+    assert reserve_seat(user_id, event_id) is ReservationOutcome.ALREADY_BOOKED
+    assert seats_left(event_id) == 3
+    assert bookings(event_id) == 1
+
+
+def test_cancel_returns_every_seat(app, make_user, make_event):
+    event_id = make_event('Concert', seats=5)
+    user_id = make_user('alice')
+    reserve_seat(user_id, event_id, seats=3)
+
+    assert release_seat(user_id, event_id) is ReservationOutcome.CANCELLED
+    assert seats_left(event_id) == 5
+    assert bookings(event_id) == 0
+    assert release_seat(user_id, event_id) is ReservationOutcome.NOT_BOOKED
+    assert seats_left(event_id) == 5
+
+
+def test_cancel_never_raises_seats_above_capacity(app, make_user, make_event):
+    event_id = make_event('Concert', seats=5)
+    user_id = make_user('alice')
+    reserve_seat(user_id, event_id, seats=3)
+    # Capacity lowered out from under the booking.
+    db.session.execute(sa.update(Event).where(Event.event_id == event_id)
+                       .values(total_seats=3, seats_left=1))
+    db.session.commit()
+
+    assert release_seat(user_id, event_id) is ReservationOutcome.CANCELLED
+    assert seats_left(event_id) == 3
+    assert bookings(event_id) == 0
+
+
+def test_batch_is_booked_entirely_or_not_at_all(app, make_user, make_event):
+    roomy = make_event('Roomy', seats=10)
+    full = make_event('Full', seats=1)
+    user_id = make_user('alice')
+
+    outcome, failed = reserve_seats(user_id, {roomy: 2, full: 2})
+
+    assert outcome is ReservationOutcome.SOLD_OUT
+    assert failed == full
+    assert seats_left(roomy) == 10
+    assert seats_left(full) == 1
+    assert bookings(roomy) == bookings(full) == 0
+
+    assert reserve_seats(user_id, {roomy: 2, full: 1}) == (ReservationOutcome.BOOKED, None)
+    assert seats_left(roomy) == 8
+    assert seats_left(full) == 0
+
+
+def test_listings_follow_an_event_selling_out_and_reopening(app, make_user, make_event):
+    event_id = make_event('Last seat', seats=1)
+    user_id = make_user('alice')
+    available = EventFilters(date_from=None, date_to=None, location=None, has_seats=True)
+
+    def listed():
+        return [row['event_id'] for row in cache.event_page(filters=available).items]
+
+    assert listed() == [event_id]
+    reserve_seat(user_id, event_id)
+    assert listed() == []
+    release_seat(user_id, event_id)
+    assert listed() == [event_id]
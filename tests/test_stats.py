@@ -0,0 +1,42 @@
+import sqlalchemy as sa
+
+from app import db
+from app.models import EventStats, DailyBookingStats
+from app.reservations import reserve_seat, release_seat
+from app.stats import analytics, roll_up, rollup
+
+
+def daily_rows():
+    return db.session.execute(
+        sa.select(DailyBookingStats.bookings, DailyBookingStats.cancellations)).all()
+
+
+def test_bookings_leave_the_daily_row_to_the_rollup(app, make_user, make_event):
+    event_id = make_event('Concert', seats=10)
+    bob = make_user('bob')
+    reserve_seat(make_user('alice'), event_id, seats=3)
+    reserve_seat(bob, event_id, seats=2)
+    release_seat(bob, event_id)
+
+    assert daily_rows() == []
+    # Analytics count what is still pending as today's.
+    assert analytics(1, 5)['daily'][0]['bookings'] == 5
+    assert analytics(1, 5)['daily'][0]['cancellations'] == 2
+
+    assert roll_up() == 1
+    db.session.commit()
+    assert daily_rows() == [(5, 2)]
+    stats = db.session.get(EventStats, event_id)
+    assert (stats.bookings, stats.pending_bookings, stats.pending_cancellations) == (3, 0, 0)
+    assert analytics(1, 5)['daily'][0]['bookings'] == 5
+    assert roll_up() == 0
+
+
+def test_rollup_worker_takes_full_batches_back_to_back(app, make_user, make_event):
+    app.config['STATS_ROLLUP_BATCH_SIZE'] = 2
+    for title in ('One', 'Two', 'Three'):
+        reserve_seat(make_user(title.lower()), make_event(title))
+
+    assert rollup.process_batch() == 2
+    assert rollup.process_batch() == 0
+    assert daily_rows() == [(3, 0)]